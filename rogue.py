@@ -3,6 +3,7 @@ import roguesettings as settings
 import rogueclasses as classes
 import roguesystem as system
 import roguedungeon as dungeon
+import roguepipeline as pipeline
 
 
 
@@ -11,7 +12,15 @@ import roguedungeon as dungeon
 
 
 if __name__ == "__main__":
-  (system.GAME_STATE["player"].x, system.GAME_STATE["player"].y, system.GAME_STATE["current_zone"], system.GAME_STATE["objs"]) = dungeon.make_zone(settings.ZONE_PROPERTIES, system.GAME_STATE["objs"])
-#  system.GAME_STATE = dungeon.make_zone(settings.ZONE_PROPERTIES, system.GAME_STATE)
-  (system.GAME_STATE["fov_map"], system.GAME_STATE["fov_recomp"]) = system.make_fov_map(system.GAME_STATE["current_zone"])
-  system.game_loop(system.GAME_STATE)
+  # Fork the generation workers before the window exists
+  if settings.PREGENERATE_ZONES > 0:
+    system.GAME_STATE["pipeline"] = pipeline.ZonePipeline(settings.PREGENERATE_PROCESSES, settings.PREGENERATE_MAX_BYTES)
+  settings.init_console()
+  system.GAME_STATE["console"] = libtcod.console_new(settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT)
+  system.enter_level(system.GAME_STATE, 1, settings.ZONE_PROPERTIES)
+  try:
+    system.game_loop(system.GAME_STATE)
+  finally:
+    if system.GAME_STATE["pipeline"] is not None:
+      system.GAME_STATE["pipeline"].close()
+    system.GAME_STATE["zones"].close()
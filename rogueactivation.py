@@ -0,0 +1,106 @@
+class Activation:
+  # Puts monsters far from the PLAYER to sleep so they cost nothing per turn.
+  # A monster falls asleep at the start of its turn when it is out of the
+  # PLAYER's sight and either outside the interest radius or in another
+  # room (see Zone.rooms) without seeing the PLAYER; it is then taken off the
+  # scheduler and filed in a bucket of the chunk (a square of chunk_size
+  # cells) it sleeps in. Waking only looks at the buckets around the PLAYER
+  # or a noise, so sleepers elsewhere are never touched.
+  def __init__(self, radius, chunk_size=16):
+    """Initialization procedure for an Activation.
+
+    radius is the interest radius around the PLAYER; 0 keeps every monster awake.
+    """
+    self.radius = radius
+    self.chunk_size = chunk_size
+    # (cx, cy) -> set of the monsters sleeping in that chunk
+    self.chunks = {}
+    # monster -> key of its chunk
+    self.asleep = {}
+
+  def __len__(self):
+    return len(self.asleep)
+
+  def __contains__(self, monster):
+    return monster in self.asleep
+
+  def should_sleep(self, state, monster):
+    """Checks whether monster is out of the PLAYER's FoV, and outside the interest radius or in another room than the PLAYER's.
+
+    Tunnels belong to no room, so they never count as another room.
+    """
+    if self.radius <= 0:
+      return False
+    zone = state["current_zone"]
+    mask = state["fov_mask"]
+    if mask is not None and mask[monster.y * zone.width + monster.x]:
+      return False
+    player = state["player"]
+    dx = player.x - monster.x
+    dy = player.y - monster.y
+    if dx * dx + dy * dy > self.radius * self.radius:
+      return True
+    room = zone.rooms.room_at(monster.x, monster.y)
+    if room is None or room.contains(player.x, player.y) or zone.rooms.room_at(player.x, player.y) is None:
+      return False
+    # Still awake while it can see the PLAYER from its room
+    return not state["perception"].can_see(state, monster, getattr(monster.ai, "sight_radius", None))
+
+  def sleep(self, scheduler, monster):
+    """Takes monster off scheduler and files it under its chunk.
+    """
+    scheduler.unschedule(monster)
+    key = (monster.x // self.chunk_size, monster.y // self.chunk_size)
+    self.chunks.setdefault(key, set()).add(monster)
+    self.asleep[monster] = key
+
+  def wake(self, scheduler, monster):
+    """Puts a sleeping monster back on scheduler, to act this turn.
+
+    Does nothing if monster isn't asleep; a monster that lost its ai (e.g. died) is only forgotten.
+    """
+    key = self.asleep.pop(monster, None)
+    if key is None:
+      return
+    bucket = self.chunks[key]
+    bucket.discard(monster)
+    if not bucket:
+      del self.chunks[key]
+    if monster.ai:
+      scheduler.schedule(monster)
+
+  def sleepers_in(self, x1, y1, x2, y2):
+    """Returns a list of the monsters sleeping in the chunks overlapping the inclusive box (x1, y1, x2, y2).
+    """
+    size = self.chunk_size
+    found = []
+    for cy in range(y1 // size, y2 // size + 1):
+      for cx in range(x1 // size, x2 // size + 1):
+        bucket = self.chunks.get((cx, cy))
+        if bucket:
+          found.extend(bucket)
+    return found
+
+  def noise(self, state, x, y, radius):
+    """Wakes every monster sleeping within radius of (x, y).
+    """
+    if not self.asleep:
+      return
+    for monster in self.sleepers_in(x - radius, y - radius, x + radius, y + radius):
+      dx = monster.x - x
+      dy = monster.y - y
+      if dx * dx + dy * dy <= radius * radius:
+        self.wake(state["scheduler"], monster)
+
+  def wake_around(self, state, box):
+    """Wakes the monsters sleeping around the PLAYER that should no longer sleep, looking within the interest radius and box, the area covered by the PLAYER's FoV.
+
+    Called whenever the FoV is recomputed, i.e. when the PLAYER moved or the terrain changed.
+    """
+    if not self.asleep:
+      return
+    player = state["player"]
+    r = self.radius
+    for monster in self.sleepers_in(player.x - r, player.y - r, player.x + r, player.y + r) + self.sleepers_in(*box):
+      if monster in self.asleep and not self.should_sleep(state, monster):
+        self.wake(state["scheduler"], monster)
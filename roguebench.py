@@ -0,0 +1,212 @@
+import libtcodpy as libtcod
+import roguesettings as settings
+import roguesystem as system
+import roguedungeon as dungeon
+import roguesim as sim
+import rogueactivation as activation
+import rogueshadowcast as shadowcast
+import json
+import sys
+import timeit
+
+# Benchmarks of the game's hot paths. Every benchmark is run over a range
+# of zone sizes and monster densities, and each result is written as one
+# JSON object per line so runs can be diffed between releases:
+#   {"bench": ..., "width": ..., "height": ..., "monsters": ..., "runs": ...,
+#    "mean_ms": ..., "p50_ms": ..., "p90_ms": ..., "p99_ms": ..., "max_ms": ...,
+#    "per_second": ...}
+# Benchmarks that look up FoVs in the cache also record
+# "fov_cache_hit_rate", the share of those lookups that were hits.
+
+SIZES = ((80, 45), (160, 90), (320, 180))
+DENSITIES = (0, 3, 10)
+# Zone seed, so every run benchmarks the same zones
+SEED = 1
+
+def percentile(samples, p):
+  """Returns the nearest-rank p-th percentile (0-100) of a sorted, non-empty list of samples.
+  """
+  rank = int(round(p / 100.0 * (len(samples) - 1)))
+  return samples[rank]
+
+def measure(func, runs, setup=None):
+  """Times runs calls of func. If given, setup is called untimed before each call and its return value is passed to func as arguments.
+
+  Returns a sorted list of durations in seconds.
+  """
+  samples = []
+  for run in range(runs):
+    args = setup() if setup is not None else ()
+    start = timeit.default_timer()
+    func(*args)
+    samples.append(timeit.default_timer() - start)
+  samples.sort()
+  return samples
+
+def summarize(bench, zone_properties, samples):
+  """Builds the result record of a benchmark from its sorted samples.
+  """
+  mean = sum(samples) / len(samples)
+  return { "bench":bench,
+           "width":zone_properties["width"],
+           "height":zone_properties["height"],
+           "monsters":zone_properties["r_mons_max"],
+           "runs":len(samples),
+           "mean_ms":mean * 1000.0,
+           "p50_ms":percentile(samples, 50) * 1000.0,
+           "p90_ms":percentile(samples, 90) * 1000.0,
+           "p99_ms":percentile(samples, 99) * 1000.0,
+           "max_ms":samples[-1] * 1000.0,
+           "per_second":1.0 / mean if mean > 0 else float('inf') }
+
+def zone_properties_for(width, height, monsters):
+  """Scales settings.ZONE_PROPERTIES to a width x height zone, keeping room density constant.
+  """
+  props = dict(settings.ZONE_PROPERTIES)
+  scale = float(width * height) / (settings.ZONE_WIDTH * settings.ZONE_HEIGHT)
+  props.update({ "width":width, "height":height, "r_mons_max":monsters, "r_num_max":max(1, int(settings.MAX_ROOMS * scale)) })
+  return props
+
+def new_state(zone_properties):
+  # A headless game with an unkillable PLAYER and an off-screen console
+  state = sim.new_game(zone_properties, SEED)
+  state["console"] = libtcod.console_new(settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT)
+  state["player"].fighter.max_hp = state["player"].fighter.cur_hp = 10 ** 9
+  return state
+
+def bench_make_zone(props, runs):
+  return measure(lambda: dungeon.make_zone(props, [], SEED), runs)
+
+def bench_make_zone_bsp(props, runs):
+  return measure(lambda: dungeon.make_zone_bsp(props, [], SEED), runs)
+
+def bench_make_fov_map(props, state, runs):
+  def make():
+    (fov_map, recompute) = system.make_fov_map(state["current_zone"])
+    state["current_zone"].detach_fov_map(fov_map)
+    libtcod.map_delete(fov_map)
+  return measure(make, runs)
+
+def bench_compute_fov(props, state, runs):
+  # The FoV computation alone, with the algorithm recompute_fov would use
+  player = state["player"]
+  zone = state["current_zone"]
+  if settings.FOV_ALGO == shadowcast.FOV_SHADOWCAST:
+    return measure(lambda: shadowcast.compute_fov(zone.blocks_sight, zone.width, zone.height, player.x, player.y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS), runs)
+  return measure(lambda: libtcod.map_compute_fov(state["fov_map"], player.x, player.y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS, settings.FOV_ALGO), runs)
+
+def bench_render_full(props, state, runs):
+  # Every cell redrawn, as on the first frame of a zone
+  def setup():
+    state["drawn"] = None
+    state["bg_planes"] = None
+    for obj in state["objs"]:
+      obj.drawn = None
+    return ()
+  return measure(lambda: (system.render_zone(state), system.render_objects(state)), runs, setup)
+
+def bench_render_fov(props, state, runs):
+  # A frame right after the PLAYER moved to a new spot and the FoV was
+  # recomputed; the FoV cache is emptied so every run computes it
+  def setup():
+    state["fov_cache"].clear()
+    state["fov_recomp"] = True
+    return ()
+  return measure(lambda: (system.recompute_fov(state), system.render_zone(state), system.render_objects(state)), runs, setup)
+
+def bench_render_fov_revisit(props, state, runs):
+  # A frame right after the PLAYER stepped back and forth between two
+  # cells, so the FoV comes from the cache
+  player = state["player"]
+  zone = state["current_zone"]
+  spots = [ (player.x, player.y) ] + [ (player.x + dx, player.y + dy) for (dx, dy) in ((1, 0), (-1, 0), (0, 1), (0, -1)) if not zone.blocks[(player.y + dy) * zone.width + player.x + dx] ][:1]
+  def setup():
+    (x, y) = spots[(spots.index((player.x, player.y)) + 1) % len(spots)]
+    zone.occupants.move(player, x, y)
+    state["fov_recomp"] = True
+    return ()
+  samples = measure(lambda: (system.recompute_fov(state), system.render_zone(state), system.render_objects(state)), runs, setup)
+  zone.occupants.move(player, *spots[0])
+  state["fov_recomp"] = True
+  return samples
+
+def bench_render_idle(props, state, runs):
+  # A frame where nothing changed
+  return measure(lambda: (system.render_zone(state), system.render_objects(state)), runs)
+
+def measure_turns(state, runs, radius):
+  # Times AI turns with the activation interest radius set to radius,
+  # waking every monster left asleep by a previous benchmark first
+  old = state["activation"]
+  for monster in list(old.asleep):
+    old.wake(state["scheduler"], monster)
+  state["activation"] = activation.Activation(radius, settings.ACTIVATION_CHUNK)
+  stdout = sys.stdout
+  sys.stdout = sim.NullOutput()
+  try:
+    return measure(lambda: state["scheduler"].run_turn(state), runs)
+  finally:
+    sys.stdout = stdout
+
+def bench_ai_turn(props, state, runs):
+  # Every monster awake, so the cost follows the monster density
+  return measure_turns(state, runs, 0)
+
+def bench_ai_turn_active(props, state, runs):
+  # Monsters far from the PLAYER asleep, as in play
+  return measure_turns(state, runs, settings.ACTIVATION_RADIUS)
+
+STATE_BENCHES = (("make_fov_map", bench_make_fov_map),
+                 ("compute_fov", bench_compute_fov),
+                 ("render_full", bench_render_full),
+                 ("render_fov", bench_render_fov),
+                 ("render_fov_revisit", bench_render_fov_revisit),
+                 ("render_idle", bench_render_idle),
+                 ("ai_turn", bench_ai_turn),
+                 ("ai_turn_active", bench_ai_turn_active))
+
+def run_all(sizes, densities, runs, only=None):
+  """Runs every benchmark (or those named in only) for each zone size and monster density.
+
+  Yields one result record per benchmark and configuration.
+  """
+  for (width, height) in sizes:
+    for monsters in densities:
+      props = zone_properties_for(width, height, monsters)
+      if only is None or "make_zone" in only:
+        yield summarize("make_zone", props, bench_make_zone(props, runs))
+      if only is None or "make_zone_bsp" in only:
+        yield summarize("make_zone_bsp", props, bench_make_zone_bsp(props, runs))
+      state = new_state(props)
+      system.recompute_fov(state)
+      for (name, bench) in STATE_BENCHES:
+        if only is None or name in only:
+          cache = state["fov_cache"]
+          (hits, misses) = (cache.hits, cache.misses)
+          result = summarize(name, props, bench(props, state, runs))
+          lookups = cache.hits + cache.misses - hits - misses
+          if lookups:
+            result["fov_cache_hit_rate"] = float(cache.hits - hits) / lookups
+          yield result
+
+def parse_sizes(text):
+  return tuple(tuple(int(v) for v in size.split('x')) for size in text.split(','))
+
+if __name__ == "__main__":
+  import argparse
+  parser = argparse.ArgumentParser(description='Benchmark zone generation, FoV, rendering and AI turns.')
+  parser.add_argument('--runs', type=int, default=50, help='timed runs per benchmark')
+  parser.add_argument('--sizes', type=parse_sizes, default=SIZES, help='comma-separated zone sizes, e.g. 80x45,160x90')
+  parser.add_argument('--densities', type=lambda text: tuple(int(v) for v in text.split(',')), default=DENSITIES, help='comma-separated maximum monsters per room')
+  parser.add_argument('--only', type=lambda text: text.split(','), default=None, help='comma-separated benchmark names to run')
+  parser.add_argument('--output', default=None, help='append results to this file instead of stdout')
+  args = parser.parse_args()
+
+  out = open(args.output, 'a') if args.output else sys.stdout
+  try:
+    for result in run_all(args.sizes, args.densities, args.runs, args.only):
+      out.write(json.dumps(result, sort_keys=True) + '\n')
+      out.flush()
+  finally:
+    if out is not sys.stdout:
+      out.close()
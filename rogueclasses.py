@@ -1,19 +1,51 @@
 import libtcodpy as libtcod
+import roguefov as fov
+import binascii
 import math
 
+# NumPy, when libtcodpy finds it, gives zero-copy array views of the Zone planes
+numpy_available = libtcod.numpy_available
+if numpy_available:
+  import numpy
+
+# Translation table swapping 0 and 1, for turning "blocks" planes into
+# "transparent"/"walkable" buffers
+_INVERT = bytes(bytearray([1, 0]) + bytearray(range(2, 256)))
+
+# Translation tables between 0/1 planes and ASCII "0"/"1" digits; a plane
+# spelled out in binary digits converts to and from a packed bit string
+# through int(), so packing runs at C speed without NumPy
+_TO_DIGITS = bytes(bytearray([ord('0'), ord('1')]) + bytearray(range(2, 256)))
+_FROM_DIGITS = bytes(bytearray([ 1 if i == ord('1') else 0 for i in range(256) ]))
+
+def pack_bits(plane):
+  """Packs a plane of 0/1 bytes into a bitmap of 8 cells per byte, first cell in the most significant bit.
+
+  Returns a bytes string of ceil(len(plane) / 8) bytes.
+  """
+  nbytes = (len(plane) + 7) // 8
+  if nbytes == 0:
+    return b''
+  digits = bytes(bytearray(plane).translate(_TO_DIGITS) + bytearray(b'0' * (nbytes * 8 - len(plane))))
+  return binascii.unhexlify('%0*x' % (nbytes * 2, int(digits, 2)))
+
+def unpack_bits(bitmap, n):
+  """Unpacks the first n cells of a bitmap made by pack_bits into a bytearray plane of 0/1 bytes.
+  """
+  if n == 0:
+    return bytearray()
+  digits = '{0:0{1}b}'.format(int(binascii.hexlify(bitmap), 16), len(bitmap) * 8)
+  return bytearray(digits[:n].encode('ascii')).translate(_FROM_DIGITS)
+
 def is_blocked(zone, objects, x, y):
   """Checks to see if a provided space in the zone is blocked. Takes the current zone, objects list, and chosen x-y coordinates as arguments.
 
-  Modifies nothing. Returns True if the coordinate is blocked, and False otherwise.
+  Blocking Objects are looked up in the zone's occupancy index; objects is kept for compatibility. Modifies nothing. Returns True if the coordinate is blocked, and False otherwise.
   """
-  if zone[x][y].blocks is True:
+  if zone.blocks[y * zone.width + x]:
     return True
 
-  for obj in objects:
-    if obj.blocks is True and obj.x == x and obj.y == y:
-      return True
-
-  return False
+  return zone.occupants.blocker_at(x, y) is not None
 
 class Object:
     # Generic Object class;
@@ -35,6 +67,8 @@ class Object:
       self.y = y
       self.char = char
       self.color = color
+      # (x, y, char, color, visible) as of the last frame this Object was rendered
+      self.drawn = None
       self.fighter = fighter
       if self.fighter:
         self.fighter.owner = self
@@ -49,8 +83,7 @@ class Object:
       Modifies x and y attributes.
       """
       if not is_blocked(state["current_zone"], state["objs"], self.x + dx, self.y + dy):
-        self.x += dx;
-        self.y += dy;
+        state["current_zone"].occupants.move(self, self.x + dx, self.y + dy)
 
     def move_toward(self, state, target_x, target_y):
       dx = target_x - self.x
@@ -72,10 +105,12 @@ class Object:
       dy = other.y - self.y
       return math.sqrt(dx ** 2 + dy ** 2)
 
-    def draw(self, console, fov_map):
-      """Draws the Object's character and color to the specified console.
+    def draw(self, console, visible=True):
+      """Draws the Object's character and color to the specified console, if visible.
+
+      Visibility comes from the caller, which looks it up for all Objects at once in the FoV mask.
       """
-      if libtcod.map_is_in_fov(fov_map, self.x, self.y):
+      if visible:
         libtcod.console_set_default_foreground(console, self.color)
         libtcod.console_put_char(console, self.x, self.y, self.char, libtcod.BKGND_NONE)
 
@@ -104,6 +139,278 @@ class Tile:
 
     self.blocks_sight = blocks_sight
 
+class Zone:
+  # A zone of the map stored as packed planes, one byte per cell per property:
+  #   blocks, blocks_sight, explored
+  # Cell (x, y) lives at index y * width + x of every plane, so a row of
+  # the zone is a contiguous slice. zone[x][y] returns a TileView for
+  # code that still reads tiles one at a time.
+  PLANES = ("blocks", "blocks_sight", "explored")
+
+  def __init__(self, width, height, blocks=True, blocks_sight=None):
+    """Initialization procedure for a Zone.
+
+    Initializes every cell of a width x height Zone with the same blocking status; by default, a tile that blocks also blocks_sight.
+    """
+    if blocks_sight is None:
+      blocks_sight = blocks
+
+    self.width = width
+    self.height = height
+    self.blocks = bytearray(b'\x01' if blocks else b'\x00') * (width * height)
+    self.blocks_sight = bytearray(b'\x01' if blocks_sight else b'\x00') * (width * height)
+    self.explored = bytearray(width * height)
+    self.occupants = Occupancy()
+    self.rooms = RoomIndex()
+    # Seed the zone was generated from, if any; see roguedungeon
+    self.seed = None
+    # Bumped on every terrain change, so caches can tell a stale zone apart
+    self.revision = 0
+    # libtcod maps kept in sync with the terrain as it changes
+    self.fov_maps = []
+    # (x1, y1, x2, y2) boxes, inclusive, of the terrain changes not yet
+    # handled by the renderer; whoever handles them empties the list
+    self.carve_log = []
+
+  def __len__(self):
+    return self.width
+
+  def __getitem__(self, x):
+    if x < 0:
+      x += self.width
+    if not 0 <= x < self.width:
+      raise IndexError('zone column out of range')
+    return ZoneColumn(self, x)
+
+  def in_bounds(self, x, y):
+    return 0 <= x < self.width and 0 <= y < self.height
+
+  def set_tile(self, x, y, blocks, blocks_sight=None):
+    """Sets the blocking status of the tile at (x, y); by default, a tile that blocks also blocks_sight.
+
+    Pushes the change into every attached FoV map. Modifies the blocks and blocks_sight planes and the revision.
+    """
+    if blocks_sight is None:
+      blocks_sight = blocks
+    i = y * self.width + x
+    self.blocks[i] = 1 if blocks else 0
+    self.blocks_sight[i] = 1 if blocks_sight else 0
+    self.revision += 1
+    self.carve_log.append((x, y, x, y))
+    for fov_map in self.fov_maps:
+      libtcod.map_set_properties(fov_map, x, y, not blocks_sight, not blocks)
+
+  def carve_rect(self, x1, y1, x2, y2, blocks=False, blocks_sight=None):
+    """Sets the blocking status of every tile in the box (x1, y1, x2, y2), inclusive, at once; by default, a tile that blocks also blocks_sight.
+
+    Rows are written with slice assignment and single columns (e.g. vertical tunnels) with one strided slice, instead of one set_tile per cell. Pushes the change into every attached FoV map and logs the box in carve_log. Modifies the blocks and blocks_sight planes and the revision.
+    """
+    if x1 > x2 or y1 > y2:
+      return
+    if blocks_sight is None:
+      blocks_sight = blocks
+    b = 1 if blocks else 0
+    s = 1 if blocks_sight else 0
+    w = self.width
+    n = x2 - x1 + 1
+    if numpy_available:
+      self.as_array("blocks")[y1:y2 + 1, x1:x2 + 1] = b
+      self.as_array("blocks_sight")[y1:y2 + 1, x1:x2 + 1] = s
+    elif n == 1:
+      column = slice(y1 * w + x1, y2 * w + x1 + 1, w)
+      self.blocks[column] = bytearray([b]) * (y2 - y1 + 1)
+      self.blocks_sight[column] = bytearray([s]) * (y2 - y1 + 1)
+    else:
+      row_blocks = bytearray([b]) * n
+      row_blocks_sight = bytearray([s]) * n
+      for y in range(y1, y2 + 1):
+        start = y * w + x1
+        self.blocks[start:start + n] = row_blocks
+        self.blocks_sight[start:start + n] = row_blocks_sight
+    self.revision += 1
+    self.carve_log.append((x1, y1, x2, y2))
+    for fov_map in self.fov_maps:
+      fov.map_fill_box(fov_map, (x1, y1, x2, y2), not blocks_sight, not blocks)
+
+  def attach_fov_map(self, fov_map):
+    """Keeps fov_map's transparency and walkability in sync with later terrain changes.
+    """
+    self.fov_maps.append(fov_map)
+
+  def detach_fov_map(self, fov_map):
+    self.fov_maps.remove(fov_map)
+
+  def transparency(self):
+    """Returns a bytearray holding 1 for every cell that doesn't block sight.
+    """
+    return self.blocks_sight.translate(_INVERT)
+
+  def walkability(self):
+    """Returns a bytearray holding 1 for every cell that doesn't block movement.
+    """
+    return self.blocks.translate(_INVERT)
+
+  def merge_explored(self, visible, box=None):
+    """Marks every cell set in visible as explored, with a single bulk OR.
+
+    visible is a row-major plane of 0/1 values covering the whole Zone. box (x1, y1, x2, y2), inclusive, limits the merge to the area visible can be set in. Modifies the explored plane.
+    """
+    if box is None:
+      box = (0, 0, self.width - 1, self.height - 1)
+    (x1, y1, x2, y2) = box
+    if numpy_available:
+      mask = numpy.frombuffer(visible, dtype=numpy.uint8).reshape(self.height, self.width)
+      self.as_array("explored")[y1:y2 + 1, x1:x2 + 1] |= mask[y1:y2 + 1, x1:x2 + 1]
+      return
+    explored = self.explored
+    for y in range(y1, y2 + 1):
+      start = y * self.width + x1
+      end = y * self.width + x2 + 1
+      explored[start:end] = bytearray(a | b for (a, b) in zip(explored[start:end], visible[start:end]))
+
+  def explored_bitmap(self):
+    """Returns the explored plane packed 8 cells per byte, for saving or comparing explored state.
+    """
+    return pack_bits(self.explored)
+
+  def load_explored_bitmap(self, bitmap):
+    """Replaces the explored plane with a bitmap made by explored_bitmap.
+
+    Modifies the explored plane.
+    """
+    self.explored[:] = unpack_bits(bitmap, self.width * self.height)
+
+  def as_array(self, plane):
+    """Returns a (height, width) NumPy uint8 view of the named plane.
+
+    The view shares memory with the Zone, so writing to it modifies the Zone. Requires NumPy.
+    """
+    return numpy.frombuffer(getattr(self, plane), dtype=numpy.uint8).reshape(self.height, self.width)
+
+  def nbytes(self):
+    """Returns the number of bytes held by the Zone's planes.
+    """
+    return sum(len(getattr(self, plane)) for plane in self.PLANES)
+
+  def to_record(self):
+    """Packs the terrain, explored state, rooms and seed of the Zone into a tuple of plain values, with every plane packed 8 cells per byte.
+
+    Occupants and attached FoV maps are left out. Returns a tuple for from_record.
+    """
+    return (self.width, self.height, self.seed,
+            tuple(pack_bits(getattr(self, plane)) for plane in self.PLANES),
+            tuple((room.x1, room.y1, room.x2 - room.x1, room.y2 - room.y1) for room in self.rooms))
+
+  @classmethod
+  def from_record(cls, record):
+    """Rebuilds a Zone from a tuple made by to_record.
+
+    Returns a Zone without occupants.
+    """
+    (width, height, seed, planes, rooms) = record
+    zone = cls(width, height)
+    for (plane, bitmap) in zip(cls.PLANES, planes):
+      getattr(zone, plane)[:] = unpack_bits(bitmap, width * height)
+    for (x, y, w, h) in rooms:
+      zone.rooms.add(Rect(x, y, w, h))
+    zone.seed = seed
+    return zone
+
+class Occupancy:
+  # Spatial index of the Objects standing in a zone, keyed by (x, y).
+  # Objects must be added when spawned and moved through move() so the
+  # index stays in sync with their coordinates.
+  def __init__(self):
+    self.cells = {}
+
+  def add(self, obj):
+    self.cells.setdefault((obj.x, obj.y), []).append(obj)
+
+  def remove(self, obj):
+    cell = self.cells[(obj.x, obj.y)]
+    cell.remove(obj)
+    if not cell:
+      del self.cells[(obj.x, obj.y)]
+
+  def move(self, obj, x, y):
+    """Moves obj to (x, y), updating both the index and the Object's coordinates.
+    """
+    self.remove(obj)
+    obj.x = x
+    obj.y = y
+    self.add(obj)
+
+  def objects_at(self, x, y):
+    return self.cells.get((x, y), ())
+
+  def blocker_at(self, x, y):
+    """Returns the first blocking Object at (x, y), or None.
+    """
+    for obj in self.cells.get((x, y), ()):
+      if obj.blocks:
+        return obj
+    return None
+
+  def fighter_at(self, x, y):
+    """Returns the first Object with a Fighter component at (x, y), or None.
+    """
+    for obj in self.cells.get((x, y), ()):
+      if obj.fighter:
+        return obj
+    return None
+
+class ZoneColumn(object):
+  # Column x of a Zone, so that zone[x][y] keeps working
+  __slots__ = ("zone", "x")
+
+  def __init__(self, zone, x):
+    self.zone = zone
+    self.x = x
+
+  def __len__(self):
+    return self.zone.height
+
+  def __getitem__(self, y):
+    if y < 0:
+      y += self.zone.height
+    if not 0 <= y < self.zone.height:
+      raise IndexError('zone row out of range')
+    return TileView(self.zone, y * self.zone.width + self.x)
+
+class TileView(object):
+  # A single cell of a Zone, exposing the same attributes as a Tile;
+  # reads and writes go straight to the Zone's planes. Writes to blocks
+  # and blocks_sight go through Zone.set_tile, so they reach the FoV maps.
+  __slots__ = ("zone", "i")
+
+  def __init__(self, zone, i):
+    self.zone = zone
+    self.i = i
+
+  def _get_blocks(self):
+    return self.zone.blocks[self.i] == 1
+
+  def _set_blocks(self, value):
+    (y, x) = divmod(self.i, self.zone.width)
+    self.zone.set_tile(x, y, value, self.zone.blocks_sight[self.i] == 1)
+
+  def _get_blocks_sight(self):
+    return self.zone.blocks_sight[self.i] == 1
+
+  def _set_blocks_sight(self, value):
+    (y, x) = divmod(self.i, self.zone.width)
+    self.zone.set_tile(x, y, self.zone.blocks[self.i] == 1, value)
+
+  def _get_explored(self):
+    return self.zone.explored[self.i] == 1
+
+  def _set_explored(self, value):
+    self.zone.explored[self.i] = 1 if value else 0
+
+  blocks = property(_get_blocks, _set_blocks)
+  blocks_sight = property(_get_blocks_sight, _set_blocks_sight)
+  explored = property(_get_explored, _set_explored)
+
 class Rect:
   # A rectangle on the map, used to depict a room
   def __init__(self, x, y, w, h):
@@ -122,6 +429,55 @@ class Rect:
     return (self.x1 <= other.x2 and self.x2 >= other.x1 and \
             self.y1 <= other.y2 and self.y2 >= other.y1)
 
+  def contains(self, x, y):
+    # Returns True if (x, y) is on the floor of the room, inside its walls
+    return self.x1 < x < self.x2 and self.y1 < y < self.y2
+
+class RoomIndex:
+  # Spatial index of the rooms (Rects) of a zone: a uniform grid of square
+  # cells of cell_size, each listing the rooms overlapping it. Overlap and
+  # containment queries only look at the few rooms sharing a grid cell
+  # instead of every room of the zone.
+  def __init__(self, cell_size=16):
+    self.cell_size = cell_size
+    self.cells = {}
+    # Rooms in the order they were added
+    self.rooms = []
+
+  def __len__(self):
+    return len(self.rooms)
+
+  def __iter__(self):
+    return iter(self.rooms)
+
+  def _keys(self, rect):
+    size = self.cell_size
+    for cy in range(rect.y1 // size, rect.y2 // size + 1):
+      for cx in range(rect.x1 // size, rect.x2 // size + 1):
+        yield (cx, cy)
+
+  def add(self, rect):
+    self.rooms.append(rect)
+    for key in self._keys(rect):
+      self.cells.setdefault(key, []).append(rect)
+
+  def intersects(self, rect):
+    """Checks whether rect intersects any indexed room, as Rect.intersect.
+    """
+    for key in self._keys(rect):
+      for room in self.cells.get(key, ()):
+        if rect.intersect(room):
+          return True
+    return False
+
+  def room_at(self, x, y):
+    """Returns the room whose floor contains (x, y), or None, e.g. in a tunnel.
+    """
+    for room in self.cells.get((x // self.cell_size, y // self.cell_size), ()):
+      if room.contains(x, y):
+        return room
+    return None
+
 class Fighter:
   # Combat-related properties and methods
   # For:
@@ -158,14 +514,33 @@ class MonsterBasic:
   # Basic AI component
   # For:
   #  - Monsters
+  def __init__(self, speed=1, sight_radius=None):
+    # Actions per player turn; see roguescheduler
+    self.speed = speed
+    # How far the monster sees; None uses the shared default, see rogueperception
+    self.sight_radius = sight_radius
+
   def take_turn(self, state):
     monster = self.owner
-    if libtcod.map_is_in_fov(state["fov_map"], monster.x, monster.y):
+    # Far from the PLAYER and out of sight, it sleeps until woken
+    activation = state["activation"]
+    if activation.should_sleep(state, monster):
+      activation.sleep(state["scheduler"], monster)
+      return
+
+    if state["perception"].can_see(state, monster, self.sight_radius):
       print 'Monster can see player!'
       if monster.distance_to(state["player"]) >= 2:
-        # Move toward the player if far away
+        # Move toward the player if far away, following the shared flow
+        # field around walls; fall back to a straight line when the field
+        # doesn't reach this far
         print 'Monster moves toward player'
-        monster.move_toward(state, state["player"].x, state["player"].y)
+        state["flow"].update(state["current_zone"], state["player"].x, state["player"].y)
+        step = state["flow"].step(monster.x, monster.y)
+        if step is not None:
+          monster.move(state, step[0], step[1])
+        else:
+          monster.move_toward(state, state["player"].x, state["player"].y)
       elif state["player"].fighter.cur_hp > 0:
         # Attack the player if player is adjacent and alive
         monster.fighter.attack(state["player"])
@@ -0,0 +1,178 @@
+import libtcodpy as libtcod
+
+# NumPy, when libtcodpy finds it, enables the batch operations on color arrays
+numpy_available = libtcod.numpy_available
+if numpy_available:
+  import numpy
+
+def _clamp(value):
+  return 0 if value < 0 else 255 if value > 255 else int(value)
+
+class Color(object):
+  # Immutable, hashable RGB color with the same arithmetic as libtcod's
+  # Color, computed in Python instead of through TCOD_color_*.
+  # Convert with .tcod only where a libtcod function needs a Color.
+  __slots__ = ("r", "g", "b", "_tcod")
+
+  def __init__(self, r=0, g=0, b=0):
+    """Initialization procedure for a Color.
+
+    Components are clamped to 0-255.
+    """
+    object.__setattr__(self, "r", _clamp(r))
+    object.__setattr__(self, "g", _clamp(g))
+    object.__setattr__(self, "b", _clamp(b))
+    object.__setattr__(self, "_tcod", None)
+
+  @classmethod
+  def from_tcod(cls, c):
+    """Builds a Color from a libtcod Color (or any r/g/b object).
+    """
+    return cls(c.r, c.g, c.b)
+
+  def __setattr__(self, name, value):
+    raise AttributeError('Color is immutable')
+
+  def __eq__(self, c):
+    return isinstance(c, Color) and self.r == c.r and self.g == c.g and self.b == c.b
+
+  def __ne__(self, c):
+    return not self.__eq__(c)
+
+  def __hash__(self):
+    return hash((self.r, self.g, self.b))
+
+  def __mul__(self, c):
+    # Multiplying by a Color scales component-wise, like TCOD_color_multiply;
+    # multiplying by a number scales every component, like TCOD_color_multiply_scalar
+    if isinstance(c, Color):
+      return Color(self.r * c.r // 255, self.g * c.g // 255, self.b * c.b // 255)
+    return Color(self.r * c, self.g * c, self.b * c)
+
+  def __add__(self, c):
+    return Color(self.r + c.r, self.g + c.g, self.b + c.b)
+
+  def __sub__(self, c):
+    return Color(self.r - c.r, self.g - c.g, self.b - c.b)
+
+  def __repr__(self):
+    return "Color(%d,%d,%d)" % (self.r, self.g, self.b)
+
+  def __getitem__(self, i):
+    if type(i) == str:
+      return getattr(self, i)
+    return (self.r, self.g, self.b)[i]
+
+  def __iter__(self):
+    yield self.r
+    yield self.g
+    yield self.b
+
+  def lerp(self, c, a):
+    """Interpolates between this Color (a = 0) and c (a = 1), like color_lerp.
+    """
+    return Color(self.r + (c.r - self.r) * a, self.g + (c.g - self.g) * a, self.b + (c.b - self.b) * a)
+
+  @property
+  def tcod(self):
+    """The equivalent libtcod Color, built on first use and cached.
+
+    Shared by every caller, so treat it as read-only.
+    """
+    if self._tcod is None:
+      object.__setattr__(self, "_tcod", libtcod.Color(self.r, self.g, self.b))
+    return self._tcod
+
+def as_array(colors):
+  """Converts a sequence of colors (or an existing (N, 3) array) to an (N, 3) NumPy int32 array. Requires NumPy.
+  """
+  if numpy_available and isinstance(colors, numpy.ndarray):
+    return colors.astype(numpy.int32).reshape(-1, 3)
+  return numpy.array([ tuple(c) for c in colors ], dtype=numpy.int32).reshape(-1, 3)
+
+def _is_array(colors):
+  return numpy_available and isinstance(colors, numpy.ndarray)
+
+# Batch operations. Each takes either a sequence of Colors, returning a list
+# of Colors, or an (N, 3) NumPy array, returning an (N, 3) int32 array.
+
+def multiply_many(colors, c):
+  """Multiplies every color by the Color c component-wise.
+  """
+  if _is_array(colors):
+    return as_array(colors) * numpy.array(tuple(c), dtype=numpy.int32) // 255
+  return [ color * c for color in colors ]
+
+def scale_many(colors, factors):
+  """Multiplies each color by its own scalar factor; factors is a sequence of the same length, or a single number.
+  """
+  if _is_array(colors):
+    scaled = as_array(colors) * numpy.asarray(factors, dtype=numpy.float64).reshape(-1, 1)
+    return numpy.clip(scaled, 0, 255).astype(numpy.int32)
+  if isinstance(factors, (int, float)):
+    return [ color * factors for color in colors ]
+  return [ color * factor for (color, factor) in zip(colors, factors) ]
+
+def add_many(colors, c):
+  """Adds the Color c to every color, saturating at 255.
+  """
+  if _is_array(colors):
+    return numpy.minimum(as_array(colors) + numpy.array(tuple(c), dtype=numpy.int32), 255)
+  return [ color + c for color in colors ]
+
+def subtract_many(colors, c):
+  """Subtracts the Color c from every color, saturating at 0.
+  """
+  if _is_array(colors):
+    return numpy.maximum(as_array(colors) - numpy.array(tuple(c), dtype=numpy.int32), 0)
+  return [ color - c for color in colors ]
+
+# Whole-frame versions of color_lerp / color_gen_map. These work on planes,
+# i.e. one value per map cell, so a full frame of lighting is a handful of
+# array operations instead of one ctypes call per cell.
+
+def lerp_planes(c1, c2, coefs):
+  """Interpolates between c1 (coef 0) and c2 (coef 1) for every coefficient in coefs.
+
+  coefs is a NumPy array of any shape, or a flat sequence of numbers. Returns a tuple of (r, g, b) planes: int32 arrays of the same shape as coefs, or lists of ints without NumPy. Raveled, the planes can go straight to console_fill_background.
+  """
+  if numpy_available:
+    a = numpy.clip(numpy.asarray(coefs, dtype=numpy.float64), 0.0, 1.0)
+    return tuple((c1[i] + (c2[i] - c1[i]) * a).astype(numpy.int32) for i in range(3))
+  planes = ([], [], [])
+  for a in coefs:
+    a = 0.0 if a < 0.0 else 1.0 if a > 1.0 else a
+    for i in range(3):
+      planes[i].append(int(c1[i] + (c2[i] - c1[i]) * a))
+  return planes
+
+def gen_map(colors, indexes):
+  """Builds a smooth gradient through colors, where colors[i] lands at position indexes[i], like color_gen_map.
+
+  Returns a list of max(indexes) + 1 Colors.
+  """
+  result = [ None ] * (max(indexes) + 1)
+  for seg in range(len(colors) - 1):
+    start = indexes[seg]
+    end = indexes[seg + 1]
+    for i in range(start, end + 1):
+      result[i] = Color(*colors[seg]).lerp(colors[seg + 1], float(i - start) / (end - start) if end > start else 1.0)
+  return result
+
+def gen_map_planes(colors, indexes):
+  """Same gradient as gen_map, as (r, g, b) lookup planes for indexing with arrays of gradient positions. Requires NumPy.
+  """
+  gradient = as_array(gen_map(colors, indexes))
+  return (gradient[:, 0], gradient[:, 1], gradient[:, 2])
+
+def torch_intensity(dx, dy, radius):
+  """Light intensity of a torch at offset (dx, dy): 1 at the torch, falling off quadratically down to 0 just beyond radius.
+  """
+  return max(0.0, 1.0 - (dx * dx + dy * dy) / float((radius + 1) ** 2))
+
+def torch_falloff(radius):
+  """Light intensity around a torch: a (2 * radius + 1) square kernel of the torch_intensity of every offset. Requires NumPy.
+  """
+  offsets = numpy.arange(-radius, radius + 1, dtype=numpy.float64)
+  dist2 = offsets[numpy.newaxis, :] ** 2 + offsets[:, numpy.newaxis] ** 2
+  return numpy.clip(1.0 - dist2 / float((radius + 1) ** 2), 0.0, 1.0)
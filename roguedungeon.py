@@ -1,116 +1,239 @@
 import libtcodpy as libtcod
 import roguesettings as settings
 import rogueclasses as classes
+import roguerandom as rnd
 from functools import partial
 import copy
+import pickle
+import zlib
 
 
 
-def make_zone(zone_properties, objects_in):
+def generate_zone(zone_properties, objects_in, seed=None):
+  """Creates a dungeon zone with the generator named by zone_properties["generator"] (see GENERATORS), settings.ZONE_GENERATOR by default.
+
+  Takes and returns the same as make_zone.
+  """
+  return GENERATORS[zone_properties.get("generator", settings.ZONE_GENERATOR)](zone_properties, objects_in, seed)
+
+def zone_rng(seed):
+  """Creates the random source a zone is generated from; a seed of None draws one from the global libtcod RNG.
+
+  Returns a tuple of the form (seed, rng), where rng is a roguerandom.BatchRandom.
+  """
+  rng = rnd.BatchRandom(seed)
+  return (rng.seed, rng)
+
+def new_rng(seed):
+  """Creates a libtcod CMWC RNG seeded with seed. Free it with libtcod.random_delete.
+  """
+  # libtcodpy's random_new_from_seed passes the seed as a c_uint, which the
+  # prototypes declared by cprotos (c_int) reject
+  return libtcod._lib.TCOD_random_new_from_seed(libtcod.RNG_CMWC, seed)
+
+def make_zone(zone_properties, objects_in, seed=None):
   """Creates a dungeon zone.
 
-  Takes a dictionary zone_properties as an argument, which contains information for zone height (int), zone width (int), minimum room size (int), maximum room size (int), maximum number of rooms (int), and a list of Objects as a second argument.
+  Takes a dictionary zone_properties as an argument, which contains information for zone height (int), zone width (int), minimum room size (int), maximum room size (int), maximum number of rooms (int), and a list of Objects as a second argument. Every random value is drawn from a dedicated RNG seeded with seed, so the same seed always gives the same zone; the seed used is kept in zone.seed.
 
   Returns a tuple of the form (player_pos_x, player_pos_y, zone, objects_out)
   """
-  rooms = []
-  num_rooms = 0
   objects_out = copy.copy(objects_in)
 
-  # Fill zone with "unblocked" tiles
-  zone = [[ classes.Tile(True)
-    for y in range(zone_properties["height"]) ]
-      for x in range(zone_properties["width"])]
-
-  for r in range(settings.MAX_ROOMS):
-    w = libtcod.random_get_int(0, zone_properties["r_min"], zone_properties["r_max"])
-    h = libtcod.random_get_int(0, zone_properties["r_min"], zone_properties["r_max"])
-    x = libtcod.random_get_int(0, 0, zone_properties["width"] - w - 1)
-    y = libtcod.random_get_int(0, 0, zone_properties["height"] - h - 1)
+  # Fill zone with "blocked" tiles
+  zone = classes.Zone(zone_properties["width"], zone_properties["height"], True)
+  (zone.seed, rng) = zone_rng(seed)
+
+  # The size and position of every attempt, drawn in four batches
+  attempts = zone_properties["r_num_max"]
+  widths = rng.ints(attempts, zone_properties["r_min"], zone_properties["r_max"])
+  heights = rng.ints(attempts, zone_properties["r_min"], zone_properties["r_max"])
+  xs = rng.floats(attempts)
+  ys = rng.floats(attempts)
+  for (w, h, fx, fy) in zip(widths, heights, xs, ys):
+    # fx is in [0, 1), so x ends up anywhere from 0 to width - w - 1
+    x = int(fx * (zone_properties["width"] - w))
+    y = int(fy * (zone_properties["height"] - h))
     new_room = classes.Rect(x, y, w, h)
-    intersects = False
-    for other_room in rooms:
-      if new_room.intersect(other_room):
-        intersects = True
-        break
-    if not intersects:
-      create_room(zone, new_room)
-      # Add objects to room (monsters, chests, etc)
-      place_objects(zone, new_room, zone_properties["r_mons_max"], objects_out)
-      (new_x, new_y) = new_room.center()
-      if num_rooms == 0:
-        player_x = new_x
-        player_y = new_y
-      else:
-        (prev_x, prev_y) = rooms[num_rooms-1].center()
-        if libtcod.random_get_int(0, 0, 1) == 1:
-          # First carve horizontally, then vertically
-          create_h_tunnel(zone, prev_x, new_x, prev_y)
-          create_v_tunnel(zone, prev_y, new_y, new_x)
-        else:
-          # Carve vertically, then horizontally
-          create_v_tunnel(zone, prev_y, new_y, prev_x)
-          create_h_tunnel(zone, prev_x, new_x, new_y)
-      rooms.append(new_room)
-      num_rooms += 1
+    if not zone.rooms.intersects(new_room):
+      add_room(zone, new_room, zone_properties, objects_out, rng)
+  (player_x, player_y) = zone.rooms.rooms[0].center()
   return (player_x, player_y, zone, objects_out)
 
+def make_zone_bsp(zone_properties, objects_in, seed=None):
+  """Creates a dungeon zone by binary space partitioning.
+
+  The zone is split recursively with libtcod's BSP toolkit, and every leaf gets one room, so rooms never overlap and are generated in a single pass. Takes the same zone_properties as make_zone, where r_num_max only bounds the split depth, and the same seed. Returns the same as make_zone.
+  """
+  objects_out = copy.copy(objects_in)
+  zone = classes.Zone(zone_properties["width"], zone_properties["height"], True)
+  (zone.seed, rng) = zone_rng(seed)
+  r_min = zone_properties["r_min"]
+  r_max = zone_properties["r_max"]
+
+  # A leaf must fit the smallest room and its walls; libtcod splits
+  # with its own RNG, seeded like the rest of the zone
+  root = libtcod.bsp_new_with_size(0, 0, zone.width, zone.height)
+  depth = max(1, (zone_properties["r_num_max"] - 1).bit_length())
+  leaves = []
+  def collect(node, data):
+    if libtcod.bsp_is_leaf(node):
+      leaves.append((node.x, node.y, node.w, node.h))
+    return True
+  try:
+    split_rng = new_rng(zone.seed)
+    try:
+      libtcod.bsp_split_recursive(root, split_rng, depth, r_min + 2, r_min + 2, settings.BSP_MAX_RATIO, settings.BSP_MAX_RATIO)
+    finally:
+      libtcod.random_delete(split_rng)
+    # In order, consecutive leaves are neighbours, which keeps tunnels short
+    libtcod.bsp_traverse_in_order(root, collect)
+  finally:
+    libtcod.bsp_delete(root)
+
+  for (leaf_x, leaf_y, leaf_w, leaf_h) in leaves:
+    w = rng.randint(min(r_min, leaf_w - 1), min(r_max, leaf_w - 1))
+    h = rng.randint(min(r_min, leaf_h - 1), min(r_max, leaf_h - 1))
+    x = rng.randint(leaf_x, leaf_x + leaf_w - w - 1)
+    y = rng.randint(leaf_y, leaf_y + leaf_h - h - 1)
+    add_room(zone, classes.Rect(x, y, w, h), zone_properties, objects_out, rng)
+  (player_x, player_y) = zone.rooms.rooms[0].center()
+  return (player_x, player_y, zone, objects_out)
+
+def add_room(zone, room, zone_properties, objects, rng=None):
+  """Carves room out of zone, fills it with monsters and connects it to the previously added room, drawing from the roguerandom.BatchRandom rng (a fresh one by default).
+
+  Modifies zone, zone.rooms and objects.
+  """
+  if rng is None:
+    rng = rnd.BatchRandom()
+  create_room(zone, room)
+  # Add objects to room (monsters, chests, etc)
+  place_objects(zone, room, zone_properties["r_mons_max"], objects, rng)
+  if len(zone.rooms) > 0:
+    (new_x, new_y) = room.center()
+    (prev_x, prev_y) = zone.rooms.rooms[-1].center()
+    if rng.randint(0, 1) == 1:
+      # First carve horizontally, then vertically
+      create_h_tunnel(zone, prev_x, new_x, prev_y)
+      create_v_tunnel(zone, prev_y, new_y, new_x)
+    else:
+      # Carve vertically, then horizontally
+      create_v_tunnel(zone, prev_y, new_y, prev_x)
+      create_h_tunnel(zone, prev_x, new_x, new_y)
+  zone.rooms.add(room)
+
 def create_room(zone, room):
   """Creates walkable space in the shape of a room.
 
-  Takes a zone[Tile][Tile] and Rect (room) as an argument. Modifies zone[x][y].
+  Takes a Zone and Rect (room) as an argument. Modifies the Zone's planes.
   """
-  # Iterate through the tiles in the Rect and make them passable
-  for x in range(room.x1 + 1, room.x2):
-    for y in range(room.y1 + 1, room.y2):
-      zone[x][y].blocks = False
-      zone[x][y].blocks_sight = False
+  # Make the tiles inside the Rect's walls passable
+  zone.carve_rect(room.x1 + 1, room.y1 + 1, room.x2 - 1, room.y2 - 1)
 
 def create_h_tunnel(zone, x1, x2, y):
-  for x in range(min(x1, x2), max(x1, x2) + 1):
-    zone[x][y].blocks = False
-    zone[x][y].blocks_sight = False
+  zone.carve_rect(min(x1, x2), y, max(x1, x2), y)
 
 def create_v_tunnel(zone, y1, y2, x):
-  for y in range(min(y1, y2), max(y1, y2) + 1):
-    zone[x][y].blocks = False
-    zone[x][y].blocks_sight = False
+  zone.carve_rect(x, min(y1, y2), x, max(y1, y2))
 
-def place_objects(zone, room, max_monsters, objects):
+def place_objects(zone, room, max_monsters, objects, rng=None):
   """Places a random number n monsters (0 < n < max_monsters) in the provided room, appending them to objects.
 
-  Modifies objects. Returns nothing.
+  Draws from the roguerandom.BatchRandom rng, a fresh one by default. Modifies objects. Returns nothing.
   """
+  if rng is None:
+    rng = rnd.BatchRandom()
   # Choose a random number of monsters
-  num_monsters = libtcod.random_get_int(0, 0, max_monsters )
-
-  for i in range(num_monsters):
-    # Choose random spot for monster
-    x = libtcod.random_get_int(0, room.x1, room.x2)
-    y = libtcod.random_get_int(0, room.y1, room.y2)
+  num_monsters = rng.randint(0, max_monsters)
 
+  # Choose random spots and kinds for all of them at once
+  xs = rng.ints(num_monsters, room.x1, room.x2)
+  ys = rng.ints(num_monsters, room.y1, room.y2)
+  rolls = rng.ints(num_monsters, 0, 100)
+  for (x, y, roll) in zip(xs, ys, rolls):
     # Only place if the location isn't blocked
     if not classes.is_blocked(zone, objects, x, y):
-      if libtcod.random_get_int(0, 0, 100) < 80:  #80% Chance of Orc
-        # Create an Orc
-        fighter_comp = classes.Fighter(hp=10, defense=0, power=3, death_func=partial(monster_death, obj_list=objects))
-        ai_comp = classes.MonsterBasic()
-        monster = classes.Object("Orc", x, y, 'o', libtcod.desaturated_green, fighter=fighter_comp, ai=ai_comp)
+      if roll < 80:  #80% Chance of Orc
+        make_monster("Orc", x, y, zone, objects)
       else:
-        #create a Troll
-        fighter_comp = classes.Fighter(hp=16, defense=1, power=4, death_func=partial(monster_death, obj_list=objects))
-        ai_comp = classes.MonsterBasic()
-        monster = classes.Object("Troll", x, y, 'T', libtcod.darker_green, fighter=fighter_comp, ai=ai_comp)
-      objects.append(monster)
+        make_monster("Troll", x, y, zone, objects)
+
+# Monster kinds, keyed by name
+MONSTERS = { "Orc":{ "char":'o', "color":libtcod.desaturated_green, "hp":10, "defense":0, "power":3 },
+             "Troll":{ "char":'T', "color":libtcod.darker_green, "hp":16, "defense":1, "power":4 } }
+
+def make_monster(name, x, y, zone, objects):
+  """Creates a monster of the kind name (see MONSTERS) at (x, y).
+
+  Modifies objects and zone's occupants. Returns the monster.
+  """
+  kind = MONSTERS[name]
+  fighter_comp = classes.Fighter(hp=kind["hp"], defense=kind["defense"], power=kind["power"], death_func=partial(monster_death, obj_list=objects))
+  ai_comp = classes.MonsterBasic()
+  monster = classes.Object(name, x, y, kind["char"], kind["color"], fighter=fighter_comp, ai=ai_comp)
+  objects.append(monster)
+  zone.occupants.add(monster)
+  return monster
+
+# Prefix of a corpse's name, followed by the monster's
+CORPSE_PREFIX = 'remains of '
 
 def monster_death(monster, obj_list):
   # Monster has died, and turns into a non-blocking, non-attacking,
   # non-moving corpse
   print monster.name.capitalize() + ' is dead!'
+  make_corpse(monster, obj_list)
+
+def make_corpse(monster, obj_list):
+  # Turns monster into its corpse, silently, e.g. when reloading a zone
   monster.char = '%'
   monster.color = libtcod.dark_red
   monster.blocks = False
   monster.fighter = None
   monster.ai = None
-  monster.name = 'remains of ' + monster.name
+  monster.name = CORPSE_PREFIX + monster.name
   monster.move_to_front(obj_list)
+
+# Serialized zones. A zone travels as a zlib-compressed pickle of plain
+# values: its Zone.to_record() and one (name, x, y, hp) record per
+# monster or corpse, so neither libtcod objects nor closures need pickling.
+ZONE_FORMAT = 2
+
+def monster_record(obj):
+  """Returns the (name, x, y, hp) record of a monster, where an hp of 0 stands for its corpse, or None if obj is neither.
+  """
+  if obj.fighter and obj.ai and obj.name in MONSTERS:
+    return (obj.name, obj.x, obj.y, obj.fighter.cur_hp)
+  if not obj.fighter and obj.name.startswith(CORPSE_PREFIX) and obj.name[len(CORPSE_PREFIX):] in MONSTERS:
+    return (obj.name[len(CORPSE_PREFIX):], obj.x, obj.y, 0)
+  return None
+
+def pack_zone(player_x, player_y, zone, objects):
+  """Serializes a zone and its monsters and corpses compactly, e.g. to ship it between processes or store it on disk.
+
+  Takes the same as make_zone returns; the PLAYER and other Objects are left out. Returns a bytes string for unpack_zone.
+  """
+  records = [ record for record in (monster_record(obj) for obj in objects) if record is not None ]
+  return zlib.compress(pickle.dumps((ZONE_FORMAT, player_x, player_y, zone.to_record(), records), 2))
+
+def unpack_zone(data, objects_in):
+  """Rebuilds a zone serialized by pack_zone, adding its monsters to a copy of the list objects_in.
+
+  Returns the same as make_zone.
+  """
+  (version, player_x, player_y, record, monsters) = pickle.loads(zlib.decompress(data))
+  if version != ZONE_FORMAT:
+    raise ValueError('unsupported zone format %r' % (version,))
+  zone = classes.Zone.from_record(record)
+  objects_out = copy.copy(objects_in)
+  for (name, x, y, hp) in monsters:
+    monster = make_monster(name, x, y, zone, objects_out)
+    if hp > 0:
+      monster.fighter.cur_hp = hp
+    else:
+      make_corpse(monster, objects_out)
+  return (player_x, player_y, zone, objects_out)
+
+# Zone generators selectable through zone_properties["generator"]
+GENERATORS = { "rooms":make_zone, "bsp":make_zone_bsp }
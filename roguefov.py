@@ -0,0 +1,224 @@
+import libtcodpy as libtcod
+import ctypes
+from collections import OrderedDict
+
+# NumPy, when libtcodpy finds it, speeds up packing cells into the libtcod
+# map buffer
+numpy_available = libtcod.numpy_available
+if numpy_available:
+  import numpy
+
+class _CMap(ctypes.Structure):
+  # Header of libtcod's map_t; cells points at width * height cell_t,
+  # indexed x + y * width, the same order as a Zone plane
+  _fields_ = [("width", ctypes.c_int),
+              ("height", ctypes.c_int),
+              ("nbcells", ctypes.c_int),
+              ("cells", ctypes.c_void_p)]
+
+_CELL_LAYOUT = None
+
+def _map_struct(m):
+  return ctypes.cast(ctypes.c_void_p(m), ctypes.POINTER(_CMap)).contents
+
+def _flag_position(m, stride):
+  # Finds the (byte, mask) of the only flag set in the first cell of m
+  raw = bytearray(ctypes.string_at(_map_struct(m).cells, stride))
+  for (byte, value) in enumerate(raw):
+    if value:
+      return (byte, value)
+  raise RuntimeError('unable to locate libtcod map cell flag')
+
+def cell_layout():
+  """Probes how libtcod lays out a map cell in memory.
+
+  Depending on how libtcod was built, a cell_t is either a one-byte bitfield or three bools. Returns a tuple (stride, transparent, walkable, fov) where each flag is a (byte offset, bit mask) pair. The result is cached.
+  """
+  global _CELL_LAYOUT
+  if _CELL_LAYOUT is None:
+    # Three bools is the widest a cell can be; three cells make sure that
+    # many bytes are allocated even when a cell is a one-byte bitfield.
+    # Only the first cell is ever set, so the others read as zero
+    m = libtcod.map_new(3, 1)
+    stride = 3
+    libtcod.map_set_properties(m, 0, 0, True, False)
+    transparent = _flag_position(m, stride)
+    libtcod.map_set_properties(m, 0, 0, False, True)
+    walkable = _flag_position(m, stride)
+    libtcod.map_set_properties(m, 0, 0, False, False)
+    libtcod._lib.TCOD_map_set_in_fov(m, 0, 0, True)
+    fov = _flag_position(m, stride)
+    libtcod.map_delete(m)
+    stride = max(transparent[0], walkable[0], fov[0]) + 1
+    _CELL_LAYOUT = (stride, transparent, walkable, fov)
+  return _CELL_LAYOUT
+
+def pack_cells(transparent, walkable):
+  """Packs per-cell transparency and walkability into libtcod's in-memory cell format.
+
+  Takes two equal-length sequences of 0/1 values (e.g. bytearrays) in row-major order. Returns a bytearray.
+  """
+  (stride, (t_byte, t_mask), (w_byte, w_mask), fov) = cell_layout()
+  n = len(transparent)
+  buf = bytearray(n * stride)
+  if numpy_available:
+    cells = numpy.frombuffer(buf, dtype=numpy.uint8).reshape(n, stride)
+    cells[:, t_byte] |= (numpy.frombuffer(bytearray(transparent), dtype=numpy.uint8) != 0) * numpy.uint8(t_mask)
+    cells[:, w_byte] |= (numpy.frombuffer(bytearray(walkable), dtype=numpy.uint8) != 0) * numpy.uint8(w_mask)
+  else:
+    for i in range(n):
+      if transparent[i]:
+        buf[i * stride + t_byte] |= t_mask
+      if walkable[i]:
+        buf[i * stride + w_byte] |= w_mask
+  return buf
+
+def map_load(m, transparent, walkable):
+  """Fills a whole libtcod map from packed transparency and walkability buffers with a single memory copy.
+
+  Takes a map created with map_new and two row-major sequences of 0/1 values of the map's size. Clears the map's FoV flags. Modifies m.
+  """
+  cmap = _map_struct(m)
+  if len(transparent) != cmap.nbcells or len(walkable) != cmap.nbcells:
+    raise ValueError('buffers must hold exactly one value per map cell')
+  buf = pack_cells(transparent, walkable)
+  ctypes.memmove(cmap.cells, (ctypes.c_char * len(buf)).from_buffer(buf), len(buf))
+
+def map_fill_box(m, box, transparent, walkable):
+  """Gives every cell of a box of a libtcod map the same transparency and walkability, one memory copy per row.
+
+  box (x1, y1, x2, y2) is inclusive. Clears the box's FoV flags. Modifies m.
+  """
+  (stride, t_flag, w_flag, fov) = cell_layout()
+  cmap = _map_struct(m)
+  (x1, y1, x2, y2) = box
+  n = x2 - x1 + 1
+  row = pack_cells(bytearray([1 if transparent else 0]) * n, bytearray([1 if walkable else 0]) * n)
+  src = (ctypes.c_char * len(row)).from_buffer(row)
+  for y in range(y1, y2 + 1):
+    ctypes.memmove(cmap.cells + (y * cmap.width + x1) * stride, src, len(row))
+
+_FOV_TABLE = None
+
+def fov_mask(m):
+  """Copies the FoV flags of a libtcod map out in one pass, instead of one map_is_in_fov call per cell.
+
+  Returns a row-major bytearray plane holding 1 for every cell in the FoV.
+  """
+  global _FOV_TABLE
+  (stride, transparent, walkable, (f_byte, f_mask)) = cell_layout()
+  if _FOV_TABLE is None:
+    # Maps a raw cell byte to 1 if its FoV bit is set, 0 otherwise
+    _FOV_TABLE = bytes(bytearray(1 if i & f_mask else 0 for i in range(256)))
+  cmap = _map_struct(m)
+  raw = bytearray(ctypes.string_at(cmap.cells, cmap.nbcells * stride))
+  return raw[f_byte::stride].translate(_FOV_TABLE)
+
+def fov_array(m):
+  """Same as fov_mask, as a (height, width) NumPy boolean array. Requires NumPy.
+  """
+  cmap = _map_struct(m)
+  return numpy.frombuffer(fov_mask(m), dtype=numpy.uint8).reshape(cmap.height, cmap.width) != 0
+
+def is_in_fov_many(mask, width, xs, ys):
+  """Batch version of map_is_in_fov, looking up many cells of a FoV mask at once.
+
+  mask is a plane from fov_mask (or any row-major 0/1 plane width cells wide), and xs and ys are equal-length sequences or NumPy arrays of coordinates. Returns a NumPy boolean array for array input, a list of bools otherwise.
+  """
+  if numpy_available and isinstance(xs, numpy.ndarray):
+    plane = numpy.frombuffer(mask, dtype=numpy.uint8)
+    return plane[numpy.asarray(ys) * width + xs] != 0
+  return [ mask[y * width + x] != 0 for (x, y) in zip(xs, ys) ]
+
+def map_set_fov(m, mask, box=None):
+  """Overwrites every FoV flag of a libtcod map from a row-major plane of 0/1 bytes, as if map_compute_fov had produced it.
+
+  box (x1, y1, x2, y2), inclusive, tells where mask may be set, which saves work without NumPy. Reads and writes the cells with one memory copy each way. Modifies m.
+  """
+  (stride, transparent, walkable, (f_byte, f_mask)) = cell_layout()
+  cmap = _map_struct(m)
+  n = cmap.nbcells
+  raw = bytearray(ctypes.string_at(cmap.cells, n * stride))
+  if numpy_available:
+    cells = numpy.frombuffer(raw, dtype=numpy.uint8).reshape(n, stride)
+    cells[:, f_byte] &= numpy.uint8(~f_mask & 0xff)
+    cells[:, f_byte] |= (numpy.frombuffer(bytearray(mask), dtype=numpy.uint8) != 0) * numpy.uint8(f_mask)
+  else:
+    clear = bytes(bytearray(i & ~f_mask for i in range(256)))
+    raw[f_byte::stride] = raw[f_byte::stride].translate(clear)
+    (x1, y1, x2, y2) = box if box is not None else (0, 0, cmap.width - 1, cmap.height - 1)
+    for y in range(y1, y2 + 1):
+      for i in range(y * cmap.width + x1, y * cmap.width + x2 + 1):
+        if mask[i]:
+          raw[i * stride + f_byte] |= f_mask
+  ctypes.memmove(cmap.cells, (ctypes.c_char * len(raw)).from_buffer(raw), len(raw))
+
+class FovCache:
+  # LRU cache of FoV results. Keys are built by the caller and should hold
+  # everything the result depends on: origin, radius, light_walls,
+  # algorithm and the zone's revision, so a terrain change never hits a
+  # stale mask. Masks are stored cropped to the box the FoV could reach.
+  def __init__(self, size=32):
+    """Initialization procedure for a FovCache.
+
+    Keeps at most size masks.
+    """
+    self.size = size
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.revision = None
+
+  def __len__(self):
+    return len(self.entries)
+
+  def get(self, key, width, height):
+    """Looks up the mask stored under key, expanded back to a full width x height plane.
+
+    Counts a hit or a miss. Returns a bytearray, or None on a miss.
+    """
+    entry = self.entries.pop(key, None)
+    if entry is None:
+      self.misses += 1
+      return None
+    # Re-inserting marks the entry as most recently used
+    self.entries[key] = entry
+    self.hits += 1
+
+    ((x1, y1, x2, y2), rows) = entry
+    mask = bytearray(width * height)
+    span = x2 - x1 + 1
+    for (row, y) in enumerate(range(y1, y2 + 1)):
+      start = y * width + x1
+      mask[start:start + span] = rows[row * span:(row + 1) * span]
+    return mask
+
+  def put(self, key, mask, width, box):
+    """Stores the part of mask inside box (x1, y1, x2, y2), inclusive, under key, evicting the least recently used masks beyond size.
+    """
+    (x1, y1, x2, y2) = box
+    rows = bytearray()
+    for y in range(y1, y2 + 1):
+      rows += mask[y * width + x1:y * width + x2 + 1]
+    self.entries.pop(key, None)
+    self.entries[key] = (box, bytes(rows))
+    while len(self.entries) > self.size:
+      self.entries.popitem(last=False)
+
+  def invalidate(self, revision):
+    """Drops every mask if the zone's revision moved on since the last call, freeing masks that can no longer hit.
+    """
+    if revision != self.revision:
+      self.entries.clear()
+      self.revision = revision
+
+  def clear(self):
+    """Drops every mask, keeping the hit and miss counts.
+    """
+    self.entries.clear()
+
+  def hit_rate(self):
+    """Returns the fraction of lookups that hit, or 0.0 before the first lookup.
+    """
+    total = self.hits + self.misses
+    return float(self.hits) / total if total else 0.0
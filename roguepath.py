@@ -0,0 +1,97 @@
+from array import array
+from collections import deque
+
+# The eight steps a monster can take, orthogonal first so that ties
+# prefer straight moves
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1))
+
+class FlowField:
+  # Distance-to-target map of a zone, shared by every monster chasing the
+  # same target. It is computed with a breadth-first search over walkable
+  # tiles and only rebuilt when the target moves or the terrain changes;
+  # each monster then picks its step in O(1) by walking downhill.
+  def __init__(self, max_distance=0):
+    """Initialization procedure for a FlowField.
+
+    Cells farther than max_distance steps from the target are left unreached; 0 searches the whole zone.
+    """
+    self.max_distance = max_distance
+    self.zone = None
+    self.origin = None
+    self.revision = None
+    self.width = 0
+    self.dist = array('i')
+
+  def update(self, zone, x, y):
+    """Makes the field point at (x, y) on zone, recomputing it only if the target, zone, or terrain changed.
+
+    Returns True if the field was recomputed.
+    """
+    if self.zone is zone and self.origin == (x, y) and self.revision == zone.revision:
+      return False
+    self.compute(zone, x, y)
+    return True
+
+  def compute(self, zone, x, y):
+    """Computes the 8-connected step distance from (x, y) to every reachable walkable tile of zone.
+
+    Modifies dist, zone, origin and revision.
+    """
+    width = zone.width
+    height = zone.height
+    blocks = zone.blocks
+    limit = self.max_distance
+    dist = array('i', [-1]) * (width * height)
+
+    start = y * width + x
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+      i = queue.popleft()
+      d = dist[i] + 1
+      if limit and d > limit:
+        continue
+      cx = i % width
+      cy = i // width
+      for (dx, dy) in DIRECTIONS:
+        nx = cx + dx
+        ny = cy + dy
+        if 0 <= nx < width and 0 <= ny < height:
+          j = ny * width + nx
+          if dist[j] < 0 and not blocks[j]:
+            dist[j] = d
+            queue.append(j)
+
+    self.dist = dist
+    self.width = width
+    self.zone = zone
+    self.origin = (x, y)
+    self.revision = zone.revision
+
+  def distance(self, x, y):
+    """Returns the step distance from (x, y) to the target, or -1 if it wasn't reached.
+    """
+    return self.dist[y * self.width + x]
+
+  def step(self, x, y):
+    """Chooses the step that brings an Object at (x, y) closest to the target.
+
+    Tiles held by blocking Objects are skipped, so a crowd flows around itself. Returns a (dx, dy) tuple, or None if (x, y) is unreached or no step gets closer.
+    """
+    zone = self.zone
+    width = self.width
+    here = self.dist[y * width + x]
+    if here < 0:
+      return None
+
+    best = None
+    best_dist = here
+    for (dx, dy) in DIRECTIONS:
+      nx = x + dx
+      ny = y + dy
+      if 0 <= nx < width and 0 <= ny < zone.height:
+        d = self.dist[ny * width + nx]
+        if 0 <= d < best_dist and zone.occupants.blocker_at(nx, ny) is None:
+          best = (dx, dy)
+          best_dist = d
+    return best
@@ -0,0 +1,59 @@
+import rogueshadowcast as shadowcast
+
+class Perception:
+  # Decides whether monsters can see the PLAYER, independently of the
+  # PLAYER's own torch.
+  #  - Monsters with the default sight radius share one visibility field,
+  #    cast from the PLAYER's position; sight is treated as symmetric, so
+  #    a monster sees the PLAYER when it stands in that field.
+  #  - Monsters with their own sight radius cast their own FoV, cached
+  #    until the monster, the PLAYER or the terrain changes.
+  # Both are skipped outright when the PLAYER is beyond the radius.
+  def __init__(self, radius):
+    """Initialization procedure for a Perception.
+
+    radius is the sight radius of monsters that don't define their own.
+    """
+    self.radius = radius
+    self.field = None
+    self.field_key = None
+    # monster -> (key, result) of its last own-FoV check
+    self.sightings = {}
+    self.fov_casts = 0
+
+  def shared_field(self, zone, x, y):
+    """Returns the visibility field of the default sight radius around (x, y), casting it only if the position or terrain changed.
+    """
+    key = (zone, x, y, zone.revision)
+    if key != self.field_key:
+      self.field = shadowcast.compute_fov(zone.blocks_sight, zone.width, zone.height, x, y, self.radius, True)
+      self.field_key = key
+      self.fov_casts += 1
+    return self.field
+
+  def can_see(self, state, monster, radius=None):
+    """Checks whether monster can see the PLAYER, with a sight radius of radius, or the default one if None.
+
+    Returns True or False.
+    """
+    zone = state["current_zone"]
+    player = state["player"]
+    if radius is None:
+      radius = self.radius
+    dx = player.x - monster.x
+    dy = player.y - monster.y
+    if dx * dx + dy * dy > radius * radius:
+      return False
+
+    if radius == self.radius:
+      return self.shared_field(zone, player.x, player.y)[monster.y * zone.width + monster.x] == 1
+
+    key = (zone, monster.x, monster.y, player.x, player.y, radius, zone.revision)
+    sighting = self.sightings.get(monster)
+    if sighting is not None and sighting[0] == key:
+      return sighting[1]
+    sight = shadowcast.compute_fov(zone.blocks_sight, zone.width, zone.height, monster.x, monster.y, radius, True)
+    self.fov_casts += 1
+    result = sight[player.y * zone.width + player.x] == 1
+    self.sightings[monster] = (key, result)
+    return result
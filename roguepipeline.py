@@ -0,0 +1,121 @@
+import roguedungeon as dungeon
+import multiprocessing
+from collections import OrderedDict
+
+# Background zone generation. Zones the PLAYER is likely to enter next are
+# generated in worker processes and shipped back serialized with
+# roguedungeon.pack_zone, so entering one only costs an unpack_zone.
+# Workers are forked when the pipeline is created, so create it before
+# opening the libtcod window.
+
+def _generate(zone_properties, seed):
+  # Runs in a worker process
+  return dungeon.pack_zone(*dungeon.generate_zone(zone_properties, [], seed))
+
+class ZonePipeline:
+  # Generates zones ahead of time on a process pool. Each zone is requested
+  # under a key, its level number; lower levels are entered sooner:
+  #  - at most one job per worker is in flight; further requests wait in a
+  #    local queue, where cancelling them costs nothing
+  #  - finished zones wait in memory, within max_bytes; the farthest
+  #    levels are dropped first, so the next one is never lost
+  #  - cancelled jobs already in flight finish, but their zone is dropped
+  def __init__(self, processes=1, max_bytes=4 * 1024 * 1024):
+    """Initialization procedure for a ZonePipeline.
+
+    Starts processes worker processes. max_bytes caps the size of the serialized zones kept waiting.
+    """
+    self.processes = processes
+    self.max_bytes = max_bytes
+    self.pool = multiprocessing.Pool(processes)
+    # key -> (zone_properties, seed) of the jobs not submitted yet
+    self.queued = OrderedDict()
+    # key -> AsyncResult of the jobs in flight
+    self.running = {}
+    # key -> serialized zone
+    self.ready = {}
+    self.ready_bytes = 0
+    # Keys of the jobs in flight whose zone is no longer wanted
+    self.cancelled = set()
+    self.generated = 0
+
+  def __contains__(self, key):
+    return key in self.ready or key in self.queued or (key in self.running and key not in self.cancelled)
+
+  def request(self, key, zone_properties, seed):
+    """Queues the generation of a zone under key, unless it's already ready or on its way.
+    """
+    self.cancelled.discard(key)
+    if key not in self.ready and key not in self.running and key not in self.queued:
+      self.queued[key] = (zone_properties, seed)
+    self.poll()
+
+  def keep(self, keys):
+    """Cancels every zone not in keys, whether queued, in flight or ready.
+    """
+    keys = set(keys)
+    for key in [ key for key in self.queued if key not in keys ]:
+      del self.queued[key]
+    for key in self.running:
+      if key not in keys:
+        self.cancelled.add(key)
+    for key in [ key for key in self.ready if key not in keys ]:
+      self.drop(key)
+
+  def drop(self, key):
+    self.ready_bytes -= len(self.ready.pop(key))
+
+  def poll(self):
+    """Collects the finished jobs and submits queued ones to the free workers, without blocking.
+
+    Called by every other method; the game loop may also call it once a turn to keep workers busy.
+    """
+    for (key, result) in list(self.running.items()):
+      if result.ready():
+        del self.running[key]
+        self.collect(key, result)
+    while self.queued and len(self.running) < self.processes:
+      (key, (zone_properties, seed)) = self.queued.popitem(last=False)
+      self.running[key] = self.pool.apply_async(_generate, (zone_properties, seed))
+
+  def collect(self, key, result):
+    # Keeps the zone of a finished job, unless it was cancelled
+    data = result.get()
+    self.generated += 1
+    if key in self.cancelled:
+      self.cancelled.discard(key)
+      return
+    self.ready[key] = data
+    self.ready_bytes += len(data)
+    while self.ready_bytes > self.max_bytes and len(self.ready) > 1:
+      self.drop(max(self.ready))
+
+  def take(self, key, objects_in):
+    """Hands over the zone generated under key, waiting for it if it is in flight.
+
+    Returns the same as roguedungeon.make_zone, with the monsters added to a copy of objects_in, or None if key was never requested (or was cancelled or dropped).
+    """
+    self.poll()
+    if key in self.queued:
+      # Generating it right away beats waiting for a worker
+      del self.queued[key]
+      return None
+    if key in self.cancelled:
+      return None
+    if key in self.running:
+      result = self.running.pop(key)
+      self.collect(key, result)
+    if key not in self.ready:
+      return None
+    data = self.ready[key]
+    self.drop(key)
+    self.poll()
+    return dungeon.unpack_zone(data, objects_in)
+
+  def close(self):
+    """Stops the workers, abandoning any work in flight.
+    """
+    self.pool.terminate()
+    self.pool.join()
+    self.queued.clear()
+    self.running.clear()
@@ -0,0 +1,120 @@
+import timeit
+from collections import deque
+
+# Upper bounds (in milliseconds) of the frame-time histogram buckets;
+# the last bucket catches everything slower
+BUCKETS_MS = (1, 2, 4, 8, 16, 33, 66, 133, 266)
+
+class FrameProfiler:
+  # Per-frame instrumentation: code timestamps itself with now() and
+  # hands the timestamp back to record() when a phase ends, e.g.
+  #   t = profiler.now()
+  #   render_all(state)
+  #   t = profiler.record("render", t)
+  # record() returns the current time, so consecutive phases chain.
+  # Each phase keeps a rolling window of its latest samples.
+  enabled = True
+
+  def __init__(self, window=120, budget=None):
+    """Initialization procedure for a FrameProfiler.
+
+    Keeps the last window samples of each phase. budget is the target frame time in seconds, used to count overruns; None disables the count.
+    """
+    self.window = window
+    self.budget = budget
+    self.samples = {}
+    # Phase names in the order they were first recorded
+    self.phases = []
+    self.frame_start = None
+    self.frames = 0
+    self.overruns = 0
+
+  def now(self):
+    return timeit.default_timer()
+
+  def record(self, phase, since):
+    """Records the time elapsed since the timestamp since under phase.
+
+    Returns the current timestamp.
+    """
+    now = timeit.default_timer()
+    samples = self.samples.get(phase)
+    if samples is None:
+      samples = self.samples[phase] = deque(maxlen=self.window)
+      self.phases.append(phase)
+    samples.append(now - since)
+    return now
+
+  def begin_frame(self):
+    self.frame_start = timeit.default_timer()
+
+  def end_frame(self):
+    """Records the whole frame under "frame" and counts it as an overrun if it took longer than the budget.
+    """
+    if self.frame_start is None:
+      return
+    self.record("frame", self.frame_start)
+    self.frames += 1
+    if self.budget is not None and self.samples["frame"][-1] > self.budget:
+      self.overruns += 1
+
+  def last(self, phase):
+    """Returns the latest sample of phase in seconds, or 0.0.
+    """
+    samples = self.samples.get(phase)
+    return samples[-1] if samples else 0.0
+
+  def stats(self, phase):
+    """Summarizes the rolling window of phase.
+
+    Returns a dict of mean, p50, p95 and max in milliseconds, or None if phase was never recorded.
+    """
+    samples = self.samples.get(phase)
+    if not samples:
+      return None
+    ordered = sorted(samples)
+    n = len(ordered)
+    return { "mean":sum(ordered) / n * 1000.0,
+             "p50":ordered[(n - 1) // 2] * 1000.0,
+             "p95":ordered[int(0.95 * (n - 1))] * 1000.0,
+             "max":ordered[-1] * 1000.0 }
+
+  def histogram(self, phase):
+    """Buckets the rolling window of phase by BUCKETS_MS.
+
+    Returns a list of len(BUCKETS_MS) + 1 counts.
+    """
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for sample in self.samples.get(phase, ()):
+      ms = sample * 1000.0
+      bucket = 0
+      while bucket < len(BUCKETS_MS) and ms > BUCKETS_MS[bucket]:
+        bucket += 1
+      counts[bucket] += 1
+    return counts
+
+  def summary(self, phases=None, labels=None):
+    """Formats the latest sample of each phase as a compact one-line string, e.g. "render 3.1 flush 0.9 ai 0.4".
+
+    labels maps phase names to shorter labels, e.g. { "render":"rn" } gives "rn3.1".
+    """
+    if labels is None:
+      return ' '.join('%s %.1f' % (phase, self.last(phase) * 1000.0) for phase in (phases or self.phases) if phase in self.samples)
+    return ' '.join('%s%.1f' % (labels.get(phase, phase), self.last(phase) * 1000.0) for phase in (phases or self.phases) if phase in self.samples)
+
+class NullProfiler:
+  # Stand-in used when profiling is off; every hook is a no-op so the
+  # instrumented code pays one method call per phase
+  enabled = False
+
+  def now(self):
+    return 0
+
+  def record(self, phase, since):
+    return 0
+
+  def begin_frame(self):
+    pass
+
+  def end_frame(self):
+    pass
@@ -0,0 +1,51 @@
+import libtcodpy as libtcod
+import random
+
+# Seeds are drawn from 0 to SEED_MAX, inclusive
+SEED_MAX = 0x7fffffff
+
+class BatchRandom:
+  # Random source drawing values in bulk instead of one libtcod
+  # random_get_int (a ctypes round-trip) per value.
+  #  - ints(k, a, b) and floats(k) draw k values in one operation
+  #  - randint(a, b) and random() hand out single values from a buffer of
+  #    floats that is refilled batch values at a time
+  # Values always come from a seeded random.Random (Mersenne Twister), so a
+  # seed gives the same stream whether or not NumPy is installed.
+  def __init__(self, seed=None, batch=256):
+    """Initialization procedure for a BatchRandom.
+
+    A seed of None draws one from the global libtcod RNG. batch is the number of floats buffered for randint() and random().
+    """
+    if seed is None:
+      seed = libtcod.random_get_int(0, 0, SEED_MAX)
+    self.seed = seed
+    self.batch = batch
+    self.rng = random.Random(seed)
+    self.buffer = []
+
+  def floats(self, k):
+    """Returns a list of k floats in [0, 1).
+    """
+    rnd = self.rng.random
+    return [ rnd() for i in range(k) ]
+
+  def ints(self, k, a, b):
+    """Returns a list of k ints in [a, b], inclusive, like k random_get_int calls.
+    """
+    n = b - a + 1
+    rnd = self.rng.random
+    return [ a + int(rnd() * n) for i in range(k) ]
+
+  def random(self):
+    """Returns a float in [0, 1) from the buffer.
+    """
+    if not self.buffer:
+      self.buffer = self.floats(self.batch)
+      self.buffer.reverse()
+    return self.buffer.pop()
+
+  def randint(self, a, b):
+    """Returns an int in [a, b], inclusive, from the buffer.
+    """
+    return a + int(self.random() * (b - a + 1))
@@ -0,0 +1,91 @@
+import heapq
+
+# Game time that passes during one player turn; an actor with speed 1
+# acts once per player turn, speed 2 twice, speed 0.5 every other turn
+TURN_TIME = 100
+# Slack given to the end of a turn, so that rounding errors accumulated in
+# fractional action times (e.g. speed 3) never give an actor an extra turn
+TIME_EPSILON = 1e-6
+
+class Scheduler:
+  # Energy-based turn scheduler for AI actors.
+  # Actors wait in a heap keyed by the game time of their next action, so
+  # only actors whose turn has come are touched. An actor is any Object
+  # with an ai component; the ai may define a speed (default 1).
+  def __init__(self):
+    """Initialization procedure for a Scheduler.
+
+    Initializes an empty queue at game time 0.
+    """
+    self.time = 0
+    self.queue = []
+    # Entry of every scheduled actor, so it can be unscheduled in O(1)
+    self.entries = {}
+    # Tie-breaker keeping actors that act at the same time in FIFO order
+    self.counter = 0
+    # Actor taking its turn right now, while it is off the queue
+    self.current = None
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, actor):
+    return actor in self.entries
+
+  def action_delay(self, actor):
+    """Returns the game time actor needs between two actions, which may be fractional.
+    """
+    speed = getattr(actor.ai, "speed", 1)
+    return max(1, TURN_TIME / float(speed))
+
+  def schedule(self, actor, delay=0):
+    """Queues actor to act delay units of game time from now, replacing any earlier entry.
+
+    Modifies the queue.
+    """
+    if actor in self.entries:
+      self.unschedule(actor)
+    entry = [self.time + delay, self.counter, actor]
+    self.counter += 1
+    self.entries[actor] = entry
+    heapq.heappush(self.queue, entry)
+
+  def unschedule(self, actor):
+    """Removes actor from the queue, if scheduled.
+
+    The heap entry is only marked as removed and is discarded when it reaches the top. Modifies the queue.
+    """
+    entry = self.entries.pop(actor, None)
+    if entry is not None:
+      entry[2] = None
+    if actor is self.current:
+      self.current = None
+
+  def add_all(self, objects):
+    """Schedules every Object in objects that has an ai component to act this turn.
+    """
+    for obj in objects:
+      if obj.ai:
+        self.schedule(obj)
+
+  def run_turn(self, state):
+    """Advances game time by one player turn, letting every actor whose time has come take its turn.
+
+    Actors that lost their ai component (e.g. died) are dropped. Modifies the queue and time.
+    """
+    end = self.time + TURN_TIME
+    while self.queue and self.queue[0][0] < end - TIME_EPSILON:
+      (when, count, actor) = heapq.heappop(self.queue)
+      if actor is None:
+        continue
+      del self.entries[actor]
+      if not actor.ai:
+        continue
+      self.time = when
+      self.current = actor
+      actor.ai.take_turn(state)
+      # The actor may have died, or been rescheduled or unscheduled during its turn
+      if self.current is actor and actor.ai and actor not in self.entries:
+        self.schedule(actor, self.action_delay(actor))
+      self.current = None
+    self.time = end
@@ -1,4 +1,5 @@
 import libtcodpy as libtcod
+import roguecolor as color
 
 WINDOW_TITLE = 'Roguelike Tutorial'
 PLAYER_SYMBOL = '@'
@@ -8,6 +9,11 @@ SCREEN_HEIGHT = 50
 LIMIT_FPS = 5
 TURN_BASED = False
 
+# Profiling
+PROFILE_FRAMES = False   # Time each phase of every frame
+PROFILE_OVERLAY = False  # Draw the frame-time breakdown next to the HP line
+PROFILE_WINDOW = 120     # Frames kept in the rolling statistics
+
 # Map Info
 ZONE_WIDTH = 80
 ZONE_HEIGHT = 45
@@ -15,21 +21,59 @@ ROOM_MAX_SIZE = 10
 ROOM_MIN_SIZE = 6
 MAX_ROOMS = 30
 MAX_ROOM_MONSTERS = 3
+# Zone generator used when ZONE_PROPERTIES doesn't name one: 'rooms' places
+# random rooms and drops overlaps, 'bsp' partitions the zone (see roguedungeon)
+ZONE_GENERATOR = 'rooms'
+# Maximum width/height ratio of the BSP generator's partitions
+BSP_MAX_RATIO = 1.5
+# Levels below the current one generated ahead in worker processes (see
+# roguepipeline); 0 generates every zone on entering it. Nothing leads to
+# another level yet, so raise it once level transitions exist
+PREGENERATE_ZONES = 0
+PREGENERATE_PROCESSES = 1
+# Bytes of pregenerated zones kept waiting to be entered
+PREGENERATE_MAX_BYTES = 4 * 1024 * 1024
+# Bytes of visited zones kept in memory; older ones are saved to
+# ZONE_STORE_DIR (a temporary directory if None) until revisited
+ZONE_STORE_BYTES = 16 * 1024 * 1024
+ZONE_STORE_DIR = None
 ZONE_PROPERTIES = { "width":ZONE_WIDTH, "height":ZONE_HEIGHT, "r_min":ROOM_MIN_SIZE, "r_max":ROOM_MAX_SIZE, "r_num_max":MAX_ROOMS, "r_mons_max":MAX_ROOM_MONSTERS }
 
 # Game Settings
+# Any libtcod FOV_* algorithm, or rogueshadowcast.FOV_SHADOWCAST for the
+# pure-Python shadowcasting engine
 FOV_ALGO = libtcod.FOV_BASIC
 FOV_LIGHT_WALLS = True
 TORCH_RADIUS = 5
-color_dark_wall = libtcod.Color(0, 0, 100)
-color_light_wall = libtcod.Color(130, 110, 50)
-color_dark_ground = libtcod.Color(50, 50, 150)
-color_light_ground = libtcod.Color(200, 180, 50)
+# Recent FoV results kept for positions the player walks back to
+FOV_CACHE_SIZE = 32
+# Steps from the player covered by the monsters' chase flow field; 0 covers the whole zone
+FLOW_RADIUS = 30
+# How far monsters see the player, unless a monster sets its own sight_radius
+MONSTER_SIGHT_RADIUS = 8
+# Monsters farther than this from the player, and out of sight, sleep until
+# woken; keep it at least MONSTER_SIGHT_RADIUS. 0 keeps every monster awake
+ACTIVATION_RADIUS = 20
+# Side of the square chunks sleeping monsters are filed by
+ACTIVATION_CHUNK = 16
+# How far the noise of a fight wakes sleeping monsters
+NOISE_RADIUS = 10
+color_dark_wall = color.Color(0, 0, 100)
+color_light_wall = color.Color(130, 110, 50)
+color_dark_ground = color.Color(50, 50, 150)
+color_light_ground = color.Color(200, 180, 50)
 COLORS = { "wall_dk":color_dark_wall, "wall_lt":color_light_wall, "gnd_dk":color_dark_ground, "gnd_lt":color_light_ground }
+# Compose the map background with NumPy when it is installed
+RENDER_VECTORIZED = True
+# Fade lit tiles toward their dark color with distance from the player
+TORCH_FALLOFF = True
 
-libtcod.console_set_custom_font('arial10x10.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
-libtcod.console_init_root(SCREEN_WIDTH, SCREEN_HEIGHT, WINDOW_TITLE, False)
+def init_console():
+  """Opens the game window. Nothing in the game needs it except drawing and keyboard input, so headless runs never call this.
+  """
+  libtcod.console_set_custom_font('arial10x10.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+  libtcod.console_init_root(SCREEN_WIDTH, SCREEN_HEIGHT, WINDOW_TITLE, False)
 
-# Limit FPS for real-time play;
-if TURN_BASED is False:
-  libtcod.sys_set_fps(LIMIT_FPS)
+  # Limit FPS for real-time play;
+  if TURN_BASED is False:
+    libtcod.sys_set_fps(LIMIT_FPS)
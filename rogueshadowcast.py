@@ -0,0 +1,76 @@
+# Recursive shadowcasting FoV computed in Python, straight from a zone's
+# blocks_sight plane. It doesn't need libtcod at all, and it returns the
+# whole visibility mask at once instead of one map_is_in_fov call per cell.
+# Select it with settings.FOV_ALGO = FOV_SHADOWCAST.
+
+# Value of settings.FOV_ALGO selecting this engine instead of a libtcod algorithm
+FOV_SHADOWCAST = 'shadowcast'
+
+# Transforms mapping the first octant onto each of the eight octants:
+# (xx, xy, yx, yy) per octant
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+def compute_fov(blocks_sight, width, height, x, y, radius=0, light_walls=True):
+  """Computes the cells visible from (x, y) with recursive shadowcasting.
+
+  blocks_sight is a row-major plane (e.g. Zone.blocks_sight) where nonzero cells block sight. radius 0 means unlimited, and light_walls chooses whether the walls bounding the visible area are visible themselves, both as in libtcod.map_compute_fov. Returns a bytearray plane holding 1 for every visible cell.
+  """
+  mask = bytearray(width * height)
+  mask[y * width + x] = 1
+  if radius <= 0:
+    radius = max(width, height)
+  radius_squared = radius * radius
+
+  for (xx, xy, yx, yy) in OCTANTS:
+    # Each entry is a row to scan and the slopes of the light still
+    # reaching it; what a wall shadows is skipped, what it leaves lit is
+    # queued for the next rows
+    stack = [ (1, 1.0, 0.0) ]
+    while stack:
+      (row, start, end) = stack.pop()
+      if start < end:
+        continue
+      new_start = start
+      for j in range(row, radius + 1):
+        dx = -j - 1
+        dy = -j
+        blocked = False
+        while dx <= 0:
+          dx += 1
+          cx = x + dx * xx + dy * xy
+          cy = y + dx * yx + dy * yy
+          l_slope = (dx - 0.5) / (dy + 0.5)
+          r_slope = (dx + 0.5) / (dy - 0.5)
+          if start < r_slope:
+            continue
+          elif end > l_slope:
+            break
+
+          # Cells outside the zone block sight and are never visible
+          inside = 0 <= cx < width and 0 <= cy < height
+          i = cy * width + cx
+          opaque = not inside or blocks_sight[i]
+          if inside and dx * dx + dy * dy <= radius_squared and (light_walls or not opaque):
+            mask[i] = 1
+
+          if blocked:
+            if opaque:
+              new_start = r_slope
+            else:
+              blocked = False
+              start = new_start
+          elif opaque and j < radius:
+            blocked = True
+            stack.append((j + 1, start, l_slope))
+            new_start = r_slope
+        if blocked:
+          break
+  return mask
+
+def compute_fov_array(blocks_sight, width, height, x, y, radius=0, light_walls=True):
+  """Same as compute_fov, returning a (height, width) NumPy boolean array. Requires NumPy.
+  """
+  import numpy
+  mask = compute_fov(blocks_sight, width, height, x, y, radius, light_walls)
+  return numpy.frombuffer(mask, dtype=numpy.uint8).reshape(height, width) != 0
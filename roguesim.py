@@ -0,0 +1,90 @@
+import roguesettings as settings
+import roguesystem as system
+import random
+import sys
+import timeit
+
+# Headless simulation: runs zone generation, AI turns and combat at full
+# CPU speed without opening a window. Input comes from an input source
+# instead of the keyboard; an input source is any object with a
+# next_action(state) method returning one of:
+#   (dx, dy)  - move or attack in that direction
+#   None      - wait a turn
+#   'exit'    - stop the simulation
+
+MOVES = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+class RandomInput:
+  # Input source that wanders and fights at random
+  def __init__(self, seed=None, wait_chance=0.1):
+    self.rng = random.Random(seed)
+    self.wait_chance = wait_chance
+
+  def next_action(self, state):
+    if self.rng.random() < self.wait_chance:
+      return None
+    return self.rng.choice(MOVES)
+
+class ScriptedInput:
+  # Input source replaying a fixed list of actions, then exiting
+  def __init__(self, actions):
+    self.actions = iter(actions)
+
+  def next_action(self, state):
+    return next(self.actions, 'exit')
+
+class NullOutput:
+  # Stand-in for sys.stdout that swallows the game's combat log
+  def write(self, text):
+    pass
+
+  def flush(self):
+    pass
+
+def new_game(zone_properties=None, seed=None):
+  """Creates a headless game state with a freshly generated zone.
+
+  Uses settings.ZONE_PROPERTIES unless zone_properties is given; the same seed always generates the same zone. Returns the state dict.
+  """
+  state = system.new_game_state()
+  system.enter_new_zone(state, zone_properties or settings.ZONE_PROPERTIES, seed)
+  return state
+
+def run(state, source, max_turns, quiet=True):
+  """Plays up to max_turns turns of state, taking the PLAYER's actions from source.
+
+  The run ends early if the PLAYER dies or source returns 'exit'. With quiet, the combat log is discarded instead of printed. Returns a dict with the number of turns played, the final status, and the elapsed seconds.
+  """
+  stdout = sys.stdout
+  if quiet:
+    sys.stdout = NullOutput()
+  start = timeit.default_timer()
+  turns = 0
+  try:
+    while turns < max_turns and state["status"] == 'playing':
+      system.recompute_fov(state)
+      action = source.next_action(state)
+      if action == 'exit':
+        break
+      if action is not None:
+        system.player_move_or_attack(state, action[0], action[1])
+      state["scheduler"].run_turn(state)
+      turns += 1
+  finally:
+    sys.stdout = stdout
+  return { "turns":turns, "status":state["status"], "seconds":timeit.default_timer() - start }
+
+if __name__ == "__main__":
+  import argparse
+  parser = argparse.ArgumentParser(description='Run the game headless with random input.')
+  parser.add_argument('--turns', type=int, default=100000, help='maximum turns per game')
+  parser.add_argument('--games', type=int, default=1, help='number of games to play')
+  parser.add_argument('--seed', type=int, default=None, help='seed of the random input')
+  parser.add_argument('--zone-seed', type=int, default=None, help='seed of the generated zones')
+  args = parser.parse_args()
+
+  for game in range(args.games):
+    seed = None if args.seed is None else args.seed + game
+    zone_seed = None if args.zone_seed is None else args.zone_seed + game
+    result = run(new_game(seed=zone_seed), RandomInput(seed), args.turns)
+    print 'game %d: %s after %d turns (%.1f turns/s)' % (game, result["status"], result["turns"], result["turns"] / max(result["seconds"], 1e-9))
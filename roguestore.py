@@ -0,0 +1,103 @@
+import roguedungeon as dungeon
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+# Rough in-memory cost of one Object and its components, for budgeting
+OBJECT_BYTES = 512
+
+class ZoneStore:
+  # Keeps the zones the PLAYER left, so revisiting one never regenerates it.
+  #  - Recently left zones stay in memory as they are, up to max_bytes;
+  #    taking one back is instant
+  #  - Beyond the budget, the least recently left zones are evicted to
+  #    disk with roguedungeon.pack_zone: bit-packed planes (explored
+  #    included), room boxes and monster/corpse records, zlib-compressed
+  # The directory is created on the first eviction; a temporary one is
+  # used unless one is given.
+  def __init__(self, max_bytes, directory=None):
+    """Initialization procedure for a ZoneStore.
+    """
+    self.max_bytes = max_bytes
+    self.directory = directory
+    self.temporary = directory is None
+    # key -> (player_x, player_y, zone, objects, size), least recent first
+    self.memory = OrderedDict()
+    self.memory_bytes = 0
+    # key -> path of the zones evicted to disk
+    self.on_disk = {}
+
+  def __len__(self):
+    return len(self.memory) + len(self.on_disk)
+
+  def __contains__(self, key):
+    return key in self.memory or key in self.on_disk
+
+  def put(self, key, player_x, player_y, zone, objects):
+    """Stores a zone, as returned by a zone generator, under key; (player_x, player_y) is where the PLAYER comes back.
+
+    objects may hold the PLAYER; it is kept, but never saved to disk. Evicts older zones to disk if the memory budget is exceeded.
+    """
+    self.discard(key)
+    size = zone.nbytes() + OBJECT_BYTES * len(objects)
+    self.memory[key] = (player_x, player_y, zone, objects, size)
+    self.memory_bytes += size
+    while self.memory_bytes > self.max_bytes and len(self.memory) > 1:
+      self.evict(next(iter(self.memory)))
+
+  def evict(self, key):
+    """Moves the in-memory zone stored under key to disk.
+    """
+    (player_x, player_y, zone, objects, size) = self.memory.pop(key)
+    self.memory_bytes -= size
+    if self.directory is None:
+      self.directory = tempfile.mkdtemp(prefix='rogue-zones-')
+    elif not os.path.isdir(self.directory):
+      os.makedirs(self.directory)
+    path = os.path.join(self.directory, 'zone-%s.bin' % (key,))
+    f = open(path, 'wb')
+    try:
+      f.write(dungeon.pack_zone(player_x, player_y, zone, objects))
+    finally:
+      f.close()
+    self.on_disk[key] = path
+
+  def take(self, key, objects_in):
+    """Removes the zone stored under key and hands it back.
+
+    A zone still in memory comes back with its own object list, which must already hold the PLAYER; a zone loaded from disk gets its monsters added to a copy of objects_in. Returns the same as roguedungeon.make_zone, or None if nothing is stored under key.
+    """
+    if key in self.memory:
+      (player_x, player_y, zone, objects, size) = self.memory.pop(key)
+      self.memory_bytes -= size
+      return (player_x, player_y, zone, objects)
+    if key in self.on_disk:
+      path = self.on_disk.pop(key)
+      f = open(path, 'rb')
+      try:
+        data = f.read()
+      finally:
+        f.close()
+      os.remove(path)
+      return dungeon.unpack_zone(data, objects_in)
+    return None
+
+  def discard(self, key):
+    """Forgets the zone stored under key, if any.
+    """
+    if key in self.memory:
+      self.memory_bytes -= self.memory.pop(key)[4]
+    if key in self.on_disk:
+      os.remove(self.on_disk.pop(key))
+
+  def close(self):
+    """Forgets every stored zone, deleting the files and the temporary directory.
+    """
+    for key in list(self.on_disk):
+      self.discard(key)
+    self.memory.clear()
+    self.memory_bytes = 0
+    if self.temporary and self.directory is not None:
+      shutil.rmtree(self.directory, True)
+      self.directory = None
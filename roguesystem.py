@@ -1,11 +1,28 @@
 import libtcodpy as libtcod
 import roguesettings as settings
 import rogueclasses as classes
+import roguefov as fov
+import roguescheduler as scheduler
+import roguepath as path
+import roguedungeon as dungeon
+import rogueprofile as profile
+import roguecolor as color
+import rogueshadowcast as shadowcast
+import rogueperception as perception
+import rogueactivation as activation
+import roguerandom as rnd
+import roguestore as store
+from functools import partial
 
-def player_death(player):
+# NumPy, when libtcodpy finds it, enables the vectorized background renderer
+numpy_available = libtcod.numpy_available
+if numpy_available:
+  import numpy
+
+def player_death(player, state):
   # The player has died, and the game ends
   print 'You died!'
-  GAME_STATE["status"] = 'dead'
+  state["status"] = 'dead'
 
   # Transform the player into a corpse
   player.char = '%'
@@ -17,15 +34,13 @@ def player_move_or_attack(state, dx, dy):
   y = state["player"].y + dy
 
   # Try to find an attackable object
-  target = None
-  for obj in state["objs"]:
-    if obj.fighter and obj.x == x and obj.y == y:
-      target = obj
-      break
+  target = state["current_zone"].occupants.fighter_at(x, y)
 
   # Attack if there's a viable target, otherwise move
   if target is not None:
     state["player"].fighter.attack(target)
+    # Fighting is loud enough to wake what sleeps nearby
+    state["activation"].noise(state, x, y, settings.NOISE_RADIUS)
   else:
     state["player"].move(state, dx, dy)
     state["fov_recomp"] = True
@@ -64,54 +79,277 @@ def handle_keys(state):
       return 'no_action'
 
 def make_fov_map(zone):
+  """Creates a libtcod FoV map for zone, bulk-loaded from the zone's planes.
 
+  The map is attached to the zone, so later terrain changes are pushed into it cell by cell. Returns a tuple of the form (fov_map, fov_recompute)
+  """
   fov_recompute = True
-  fov_map = libtcod.map_new(len(zone), len(zone[0]))
-
-  for x in range(len(zone)):
-    for y in range(len(zone[0])):
-      libtcod.map_set_properties(fov_map, x, y, not zone[x][y].blocks_sight, not zone[x][y].blocks)
+  fov_map = libtcod.map_new(zone.width, zone.height)
+  fov.map_load(fov_map, zone.transparency(), zone.walkability())
+  zone.attach_fov_map(fov_map)
 
   return (fov_map, fov_recompute)
 
-def render_all(state):
+def mark_dirty(state, x1, y1, x2, y2):
+  """Flags a rectangle of zone cells (inclusive corners) for redraw on the next frame.
 
-  # Recompute the FoV map if necessary
+  Coordinates are clamped to the current zone. Modifies state["dirty"].
+  """
+  zone = state["current_zone"]
+  x1 = max(x1, 0)
+  y1 = max(y1, 0)
+  x2 = min(x2, zone.width - 1)
+  y2 = min(y2, zone.height - 1)
+  if x1 <= x2 and y1 <= y2:
+    state["dirty"].append((x1, y1, x2, y2))
+
+def torch_box(zone, x, y):
+  """Returns the (x1, y1, x2, y2) box, inclusive and clamped to zone, that a FoV from (x, y) can reach; an unlimited torch radius covers the whole zone.
+  """
+  radius = settings.TORCH_RADIUS
+  if radius <= 0:
+    return (0, 0, zone.width - 1, zone.height - 1)
+  return (max(x - radius, 0), max(y - radius, 0), min(x + radius, zone.width - 1), min(y + radius, zone.height - 1))
+
+def mark_fov_dirty(state, x, y):
+  """Flags every cell whose visibility may change when the FoV origin moves to (x, y).
+
+  Only the torch boxes around the previous and the new origin can change.
+  """
+  zone = state["current_zone"]
+  if state["fov_origin"] is None:
+    mark_dirty(state, 0, 0, zone.width - 1, zone.height - 1)
+  else:
+    mark_dirty(state, *torch_box(zone, state["fov_origin"][0], state["fov_origin"][1]))
+    mark_dirty(state, *torch_box(zone, x, y))
+  state["fov_origin"] = (x, y)
+
+def render_zone(state):
+  """Redraws the background of the dirty zone cells whose color changed since the last frame.
+
+  Uses the NumPy renderer when it is available and enabled. Reads the FoV mask and explored plane without modifying them. Modifies state["drawn"] and state["dirty"].
+  """
+  if numpy_available and settings.RENDER_VECTORIZED:
+    render_zone_vectorized(state)
+    return
+
+  zone = state["current_zone"]
+  console = state["console"]
+  visible = state["fov_mask"]
+  radius = settings.TORCH_RADIUS
+  falloff = settings.TORCH_FALLOFF and radius > 0 and state["fov_origin"] is not None
+  if falloff:
+    (torch_x, torch_y) = state["fov_origin"]
+
+  # First frame on this zone; every cell needs to be drawn once
+  if state["drawn"] is None:
+    state["drawn"] = [ None ] * (zone.width * zone.height)
+    mark_dirty(state, 0, 0, zone.width - 1, zone.height - 1)
+
+  drawn = state["drawn"]
+  seen = set()
+  for (x1, y1, x2, y2) in state["dirty"]:
+    for y in range(y1, y2 + 1):
+      for x in range(x1, x2 + 1):
+        i = y * zone.width + x
+        if i in seen:
+          continue
+        seen.add(i)
+        if visible[i] and falloff:
+          # Same shading as light_torch: a (dark, lit, intensity) key
+          key = ("wall_dk", "wall_lt") if zone.blocks_sight[i] else ("gnd_dk", "gnd_lt")
+          key += (color.torch_intensity(x - torch_x, y - torch_y, radius),)
+        elif visible[i]:
+          key = "wall_lt" if zone.blocks_sight[i] else "gnd_lt"
+        elif zone.explored[i]:
+          # Even if not currently visible, PLAYER may see this space if it has already been explored
+          key = "wall_dk" if zone.blocks_sight[i] else "gnd_dk"
+        else:
+          key = None
+        if key != drawn[i]:
+          if key is None:
+            bg = libtcod.black
+          elif type(key) == tuple:
+            bg = settings.COLORS[key[0]].lerp(settings.COLORS[key[1]], key[2]).tcod
+          else:
+            bg = settings.COLORS[key].tcod
+          libtcod.console_set_char_background(console, x, y, bg, libtcod.BKGND_SET)
+          drawn[i] = key
+  state["dirty"] = []
+
+def render_zone_vectorized(state):
+  """Composes the whole zone background from visible/explored/wall planes and uploads it with a single console_fill_background call.
+
+  Nothing is uploaded when no cell is dirty. Reads the FoV mask and explored plane without modifying them. Modifies state["bg_planes"] and state["dirty"].
+  """
+  zone = state["current_zone"]
+  console = state["console"]
+  width = zone.width
+  height = zone.height
+
+  # First frame on this zone; build the plane views and draw every cell once
+  planes = state["bg_planes"]
+  if planes is None:
+    planes = { "explored":zone.as_array("explored"),
+               "wall":zone.as_array("blocks_sight") }
+    state["bg_planes"] = planes
+    mark_dirty(state, 0, 0, width - 1, height - 1)
+
+  if not state["dirty"]:
+    return
+  state["dirty"] = []
+
+  visible = numpy.frombuffer(state["fov_mask"], dtype=numpy.uint8).reshape(height, width) != 0
+
+  # Palette index per cell: 0 unexplored, 1/2 dark wall/ground, 3/4 lit wall/ground
+  palette = numpy.array([ (0, 0, 0) ] + [ tuple(settings.COLORS[key]) for key in ("wall_dk", "gnd_dk", "wall_lt", "gnd_lt") ], dtype=numpy.int32)
+  ground = planes["wall"] == 0
+  index = numpy.where(visible, 3 + ground, numpy.where(planes["explored"] != 0, 1 + ground, 0))
+
+  zone_rgb = palette[index]
+  if settings.TORCH_FALLOFF and settings.TORCH_RADIUS > 0 and state["fov_origin"] is not None:
+    light_torch(zone_rgb, visible, planes["wall"], state["fov_origin"], settings.TORCH_RADIUS)
+
+  # The console may be larger (status rows) or smaller than the zone
+  rgb = numpy.zeros((settings.SCREEN_HEIGHT, settings.SCREEN_WIDTH, 3), dtype=numpy.int32)
+  h = min(height, settings.SCREEN_HEIGHT)
+  w = min(width, settings.SCREEN_WIDTH)
+  rgb[:h, :w] = zone_rgb[:h, :w]
+  libtcod.console_fill_background(console, rgb[..., 0].ravel(), rgb[..., 1].ravel(), rgb[..., 2].ravel())
+
+def light_torch(rgb, visible, wall, origin, radius):
+  """Shades the visible cells around origin from their lit toward their dark color as they get farther from the torch.
+
+  rgb is the (height, width, 3) zone color array; only the torch box around origin is touched. Modifies rgb.
+  """
+  (x, y) = origin
+  (height, width) = visible.shape
+  x1 = max(x - radius, 0)
+  y1 = max(y - radius, 0)
+  x2 = min(x + radius + 1, width)
+  y2 = min(y + radius + 1, height)
+  kernel = color.torch_falloff(radius)[y1 - y + radius:y2 - y + radius, x1 - x + radius:x2 - x + radius]
+
+  box = rgb[y1:y2, x1:x2]
+  box_visible = visible[y1:y2, x1:x2]
+  box_wall = wall[y1:y2, x1:x2] != 0
+  for (dark, light, mask) in (("wall_dk", "wall_lt", box_wall), ("gnd_dk", "gnd_lt", ~box_wall)):
+    lit = numpy.dstack(color.lerp_planes(settings.COLORS[dark], settings.COLORS[light], kernel))
+    selected = box_visible & mask
+    box[selected] = lit[selected]
+
+def render_objects(state):
+  """Redraws only the Objects that moved, changed appearance, or entered or left the FoV.
+
+  Cells an Object left are cleared, and every Object standing on a touched cell is drawn again so stacked Objects (e.g. corpses) survive. Modifies each Object's drawn signature.
+  """
+  console = state["console"]
+  objs = state["objs"]
+  visibility = fov.is_in_fov_many(state["fov_mask"], state["current_zone"].width, [ obj.x for obj in objs ], [ obj.y for obj in objs ])
+  touched = set()
+  for (obj, visible) in zip(objs, visibility):
+    sig = (obj.x, obj.y, obj.char, obj.color, visible)
+    if sig != obj.drawn:
+      # Moving around in the dark doesn't touch the console at all
+      if obj.drawn is not None and obj.drawn[4]:
+        touched.add((obj.drawn[0], obj.drawn[1]))
+      if visible:
+        touched.add((obj.x, obj.y))
+      obj.drawn = sig
+
+  if not touched:
+    return
+
+  for (x, y) in touched:
+    libtcod.console_put_char(console, x, y, ' ', libtcod.BKGND_NONE)
+
+  # Draws visible Objects on touched cells, player last so the player stays on top
+  for obj in objs:
+    if obj != state["player"] and (obj.x, obj.y) in touched:
+      obj.draw(console, obj.drawn[4])
+  if (state["player"].x, state["player"].y) in touched:
+    state["player"].draw(console, state["player"].drawn[4])
+
+def apply_carves(state):
+  """Flags the cells changed since the last call, as logged in the zone's carve_log, for redraw, and the FoV for recomputing.
+
+  Modifies state["dirty"], state["fov_recomp"] and the carve log.
+  """
+  log = state["current_zone"].carve_log
+  if log:
+    for box in log:
+      mark_dirty(state, *box)
+    del log[:]
+    state["fov_recomp"] = True
+
+def recompute_fov(state):
+  """Recomputes the PLAYER's FoV if the fov_recomp flag is set or the terrain changed.
+
+  Kept apart from drawing so the simulation can run without a console. Modifies the FoV map, state["fov_mask"], state["fov_recomp"] and the zone's explored plane.
+  """
+  apply_carves(state)
   if state["fov_recomp"] is True:
     state["fov_recomp"] = False
-    libtcod.map_compute_fov(state["fov_map"], state["player"].x, state["player"].y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS, settings.FOV_ALGO)
+    zone = state["current_zone"]
+    cache = state["fov_cache"]
+    (x, y) = (state["player"].x, state["player"].y)
+    box = torch_box(zone, x, y)
 
-  # Draws all Objects in the list
-  for obj in state["objs"]:
-    if obj != state["player"]:
-      obj.draw(state["console"], state["fov_map"])
-  state["player"].draw(state["console"], state["fov_map"])
-
-  for x in range(len(state["current_zone"])):
-    for y in range(len(state["current_zone"][0])):
-      visible = libtcod.map_is_in_fov(state["fov_map"], x, y)
-      wall = state["current_zone"][x][y].blocks_sight
-      if visible:
-        if wall:
-          libtcod.console_set_char_background(state["console"], x, y, \
-                                              settings.COLORS["wall_lt"], \
-                                              libtcod.BKGND_SET)
-        else:
-          libtcod.console_set_char_background(state["console"], x, y, \
-                                              settings.COLORS["gnd_lt"], \
-                                              libtcod.BKGND_SET)
-        state["current_zone"][x][y].explored = True
+    # Revisiting a recent position on unchanged terrain reuses its mask;
+    # the libtcod map gets the cached flags so it never disagrees with it
+    cache.invalidate(zone.revision)
+    key = (x, y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS, settings.FOV_ALGO, zone.revision)
+    mask = cache.get(key, zone.width, zone.height)
+    if mask is None:
+      if settings.FOV_ALGO == shadowcast.FOV_SHADOWCAST:
+        mask = shadowcast.compute_fov(zone.blocks_sight, zone.width, zone.height, x, y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS)
+        fov.map_set_fov(state["fov_map"], mask, box)
       else:
-        # Even if not currently visible, PLAYER may see this space if it has already been explored
-        if state["current_zone"][x][y].explored:
-          if wall:
-            libtcod.console_set_char_background(state["console"], x, y, \
-                                                settings.COLORS["wall_dk"], \
-                                                libtcod.BKGND_SET)
-          else:
-            libtcod.console_set_char_background(state["console"], x, y, \
-                                                settings.COLORS["gnd_dk"], \
-                                                libtcod.BKGND_SET)
+        libtcod.map_compute_fov(state["fov_map"], x, y, settings.TORCH_RADIUS, settings.FOV_LIGHT_WALLS, settings.FOV_ALGO)
+        mask = fov.fov_mask(state["fov_map"])
+      cache.put(key, mask, zone.width, box)
+    else:
+      fov.map_set_fov(state["fov_map"], mask, box)
+    state["fov_mask"] = mask
+
+    # Whatever the PLAYER sees now is explored from now on
+    zone.merge_explored(mask, box)
+    mark_fov_dirty(state, x, y)
+    state["activation"].wake_around(state, box)
+
+# Phases shown by the profile overlay, with the short labels that fit them
+# next to the PLAYER's stats
+OVERLAY_PHASES = ("fov", "zone", "objects", "render", "flush", "input", "ai")
+OVERLAY_LABELS = { "fov":"fv", "zone":"zn", "objects":"ob", "render":"rn", "flush":"fl", "input":"in", "ai":"ai" }
+
+def render_profile_overlay(state):
+  """Draws the latest frame-time breakdown next to the PLAYER's stats.
+
+  Shows libtcod's own last frame length followed by the profiler's per-phase times in milliseconds, e.g. "16.7ms|fv0.4 zn1.2 ... hit85%", ending with the FoV cache hit rate; in red when the last frame overran the budget.
+  """
+  profiler = state["profiler"]
+  frame_ms = libtcod.sys_get_last_frame_length() * 1000.0
+  over = profiler.budget is not None and profiler.last("frame") > profiler.budget
+  text = '%.1fms|%s hit%d%%' % (frame_ms, profiler.summary(OVERLAY_PHASES, OVERLAY_LABELS), state["fov_cache"].hit_rate() * 100)
+  libtcod.console_set_default_foreground(0, libtcod.red if over else libtcod.grey)
+  libtcod.console_print_ex(0, 16, settings.SCREEN_HEIGHT - 2, \
+                            libtcod.BKGND_NONE, libtcod.LEFT, \
+                            text[:settings.SCREEN_WIDTH - 16])
+  libtcod.console_set_default_foreground(0, libtcod.white)
+
+def render_all(state):
+  profiler = state["profiler"]
+  t = profiler.now()
+
+  # Recompute the FoV map if necessary
+  recompute_fov(state)
+  t = profiler.record("fov", t)
+
+  render_zone(state)
+  t = profiler.record("zone", t)
+  render_objects(state)
+  t = profiler.record("objects", t)
+
   #  Flush console and push changes to screen
   libtcod.console_blit(state["console"], 0, 0, \
                       settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT, \
@@ -122,43 +360,127 @@ def render_all(state):
                             libtcod.BKGND_NONE, libtcod.LEFT, \
                             'HP: ' + str(state["player"].fighter.cur_hp) + \
                              '/' + str(state["player"].fighter.max_hp))
+  if profiler.enabled and settings.PROFILE_OVERLAY:
+    render_profile_overlay(state)
 
 # Main game loop
 #  If real-time, each loop iteration is a frame;
 #  If turn-based, each loop iteration is a turn
 def game_loop(state):
 
+  profiler = state["profiler"]
   while not libtcod.console_is_window_closed():
+    profiler.begin_frame()
+    t = profiler.now()
     render_all(state)
+    t = profiler.record("render", t)
 
     libtcod.console_flush()
-
-    # Erase all OBJECTS at their old locations, before they move
-    for obj in state["objs"]:
-      obj.clear(state["console"])
+    t = profiler.record("flush", t)
 
     state["action"] = handle_keys(state)
+    t = profiler.record("input", t)
     if state["action"] == 'exit':
       break
 
     if state["status"] == 'playing' and (state["action"] != 'no_action' or settings.TURN_BASED is False):
-      for obj in state["objs"]:
-        if obj.ai:
-          obj.ai.take_turn(state)
-
-GAME_CONSOLE = libtcod.console_new(settings.SCREEN_WIDTH, settings.SCREEN_HEIGHT)
-
-# Initialize PLAYER and world information
-# Kind of messy right now, will eventually need refactoring to be cleaner
-# and minimize pollution of module namespace
-
-PLAYER = classes.Object("Hero", settings.SCREEN_WIDTH/2, settings.SCREEN_HEIGHT/2, settings.PLAYER_SYMBOL, settings.PLAYER_COLOR, fighter=classes.Fighter(hp=30, defense=2, power=5, death_func=player_death))
-
-PLAYER_ACTION = None
-GAME_STATUS = 'playing'
-#npc = Object(SCREEN_WIDTH/2 - 5, SCREEN_HEIGHT/2, '@', libtcod.yellow)
-OBJECTS = [PLAYER]
-ZONE = None
-FOV_MAP = None
-FOV_RECOMPUTE = None
-GAME_STATE = { "console":GAME_CONSOLE, "player":PLAYER, "action":PLAYER_ACTION, "status":GAME_STATUS, "objs":OBJECTS, "current_zone":ZONE, "fov_map":FOV_MAP, "fov_recomp":FOV_RECOMPUTE }
+      state["scheduler"].run_turn(state)
+      profiler.record("ai", t)
+      # Keeps the workers busy pregenerating zones
+      if state["pipeline"] is not None:
+        state["pipeline"].poll()
+    profiler.end_frame()
+
+def new_profiler():
+  """Returns a FrameProfiler if settings.PROFILE_FRAMES is on, and a no-op NullProfiler otherwise.
+  """
+  if settings.PROFILE_FRAMES:
+    budget = 1.0 / settings.LIMIT_FPS if settings.TURN_BASED is False else None
+    return profile.FrameProfiler(settings.PROFILE_WINDOW, budget)
+  return profile.NullProfiler()
+
+def new_game_state(console=None):
+  """Creates a fresh game state holding a new PLAYER and no zone.
+
+  console is the off-screen console render_all draws to; it may be None when running headless. Returns a dict.
+  """
+  state = { "console":console, "player":None, "action":None, "status":'playing', "objs":[], "current_zone":None, "fov_map":None, "fov_recomp":None, "fov_mask":None, "fov_cache":fov.FovCache(settings.FOV_CACHE_SIZE), "fov_origin":None, "drawn":None, "bg_planes":None, "dirty":[], "scheduler":scheduler.Scheduler(), "flow":path.FlowField(settings.FLOW_RADIUS), "perception":perception.Perception(settings.MONSTER_SIGHT_RADIUS), "activation":activation.Activation(settings.ACTIVATION_RADIUS, settings.ACTIVATION_CHUNK), "profiler":new_profiler(), "seed":None, "level":0, "pipeline":None, "zones":store.ZoneStore(settings.ZONE_STORE_BYTES, settings.ZONE_STORE_DIR) }
+  state["player"] = classes.Object("Hero", settings.SCREEN_WIDTH/2, settings.SCREEN_HEIGHT/2, settings.PLAYER_SYMBOL, settings.PLAYER_COLOR, fighter=classes.Fighter(hp=30, defense=2, power=5, death_func=partial(player_death, state=state)))
+  state["objs"].append(state["player"])
+  return state
+
+def enter_new_zone(state, zone_properties, seed=None):
+  """Generates a new zone from zone_properties and seed (see roguedungeon.make_zone) and places the PLAYER in it.
+
+  Only the PLAYER carries over from the previous zone. Replaces the zone, objects, scheduler and FoV map of state and resets the render caches.
+  """
+  install_zone(state, *dungeon.generate_zone(zone_properties, [state["player"]], seed))
+
+def level_seed(state, level):
+  """Returns the seed of the zone of level, derived from the game's seed so every level is reproducible.
+  """
+  if state["seed"] is None:
+    state["seed"] = libtcod.random_get_int(0, 0, rnd.SEED_MAX)
+  return (state["seed"] * 1000003 + level) & rnd.SEED_MAX
+
+def enter_level(state, level, zone_properties):
+  """Moves the PLAYER to the zone of level, then has the zone pipeline, if any, pregenerate the next settings.PREGENERATE_ZONES levels.
+
+  The zone the PLAYER leaves is kept in state["zones"]. The zone of level comes from there if it was visited before, then from the pipeline, and is generated on the spot otherwise. Modifies the same as enter_new_zone, and state["level"].
+  """
+  player = state["player"]
+  zones = state["zones"]
+  if state["current_zone"] is not None:
+    state["current_zone"].occupants.remove(player)
+    zones.put(state["level"], player.x, player.y, state["current_zone"], state["objs"])
+
+  pipeline = state["pipeline"]
+  result = zones.take(level, [player])
+  if result is None and pipeline is not None:
+    result = pipeline.take(level, [player])
+  if result is None:
+    result = dungeon.generate_zone(zone_properties, [player], level_seed(state, level))
+  install_zone(state, *result)
+  state["level"] = level
+
+  if pipeline is not None:
+    upcoming = [ next_level for next_level in range(level + 1, level + 1 + settings.PREGENERATE_ZONES) if next_level not in zones ]
+    pipeline.keep(upcoming)
+    for next_level in upcoming:
+      pipeline.request(next_level, zone_properties, level_seed(state, next_level))
+
+def install_zone(state, player_x, player_y, zone, objects):
+  """Makes zone, as returned by a zone generator, the current zone, with the PLAYER at (player_x, player_y).
+
+  objects must hold the PLAYER. Replaces the zone, objects, scheduler and FoV map of state and resets the render caches.
+  """
+  player = state["player"]
+  if state["fov_map"] is not None:
+    state["current_zone"].detach_fov_map(state["fov_map"])
+    libtcod.map_delete(state["fov_map"])
+
+  (player.x, player.y, state["current_zone"], state["objs"]) = (player_x, player_y, zone, objects)
+  state["current_zone"].occupants.add(player)
+  state["scheduler"] = scheduler.Scheduler()
+  state["scheduler"].add_all(state["objs"])
+  state["perception"] = perception.Perception(settings.MONSTER_SIGHT_RADIUS)
+  state["activation"] = activation.Activation(settings.ACTIVATION_RADIUS, settings.ACTIVATION_CHUNK)
+  (state["fov_map"], state["fov_recomp"]) = make_fov_map(state["current_zone"])
+
+  # Everything on the console belongs to the old zone
+  if state["console"] is not None:
+    libtcod.console_clear(state["console"])
+  for obj in state["objs"]:
+    obj.drawn = None
+  state["fov_mask"] = None
+  state["fov_cache"] = fov.FovCache(settings.FOV_CACHE_SIZE)
+  state["fov_origin"] = None
+  state["drawn"] = None
+  state["bg_planes"] = None
+  state["dirty"] = []
+  # The first frame draws the whole zone, generation carves included
+  del state["current_zone"].carve_log[:]
+
+# Initialize PLAYER and world information; the console is created by
+# rogue.py once the root window exists
+GAME_STATE = new_game_state()